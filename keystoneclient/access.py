@@ -15,7 +15,7 @@
 # limitations under the License.
 
 
-import datetime
+import calendar
 
 from keystoneclient.openstack.common import timeutils
 from keystoneclient import service_catalog
@@ -25,13 +25,26 @@ from keystoneclient import service_catalog
 STALE_TOKEN_DURATION = 30
 
 
+def _utc_timestamp(value):
+    """Convert a datetime, naive UTC or timezone aware, to an epoch float."""
+    return (calendar.timegm(value.utctimetuple()) +
+            value.microsecond / 1000000.0)
+
+
 class AccessInfo(dict):
     """Encapsulates a raw authentication token from keystone.
 
     Provides helper methods for extracting useful values from that token.
 
+    The raw token data is available through the dict interface. The parsed
+    expiry is kept with the instance and only parsed again once the expiry
+    in the data changes, and the service catalog is only built when it is
+    first accessed.
+
     """
 
+    __slots__ = ('_expiry', '_service_catalog', '_modified')
+
     @classmethod
     def factory(cls, resp=None, body=None, **kwargs):
         """Create AccessInfo object given a successful auth response & body
@@ -56,14 +69,104 @@ class AccessInfo(dict):
         else:
             return AccessInfoV2(**kwargs)
 
-    def __init__(self, *args, **kwargs):
-        super(AccessInfo, self).__init__(*args, **kwargs)
-        self.service_catalog = service_catalog.ServiceCatalog.factory(
+    def __new__(cls, *args, **kwargs):
+        self = super(AccessInfo, cls).__new__(cls, *args, **kwargs)
+        # (expiry text, datetime, timestamp) of the last parsed expiry
+        self._expiry = None
+        self._service_catalog = None
+        # whether the data was modified before the catalog was built
+        self._modified = False
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    def __setstate__(self, state):
+        # instances pickled before AccessInfo used slots carry their
+        # attributes as state, the catalog is rebuilt from the data instead
+        self._expiry = None
+        self._service_catalog = None
+        self._modified = False
+
+    def _build_service_catalog(self):
+        return service_catalog.ServiceCatalog.factory(
             resource_dict=self, region_name=self.get('region_name'))
 
+    @property
+    def service_catalog(self):
+        if self._service_catalog is None:
+            catalog = self._build_service_catalog()
+            if self._modified:
+                catalog.invalidate()
+            self._service_catalog = catalog
+        return self._service_catalog
+
+    def _invalidate_service_catalog(self):
+        # drop the catalog endpoint index whenever the data changes
+        if self._service_catalog is not None:
+            self._service_catalog.invalidate()
+        else:
+            self._modified = True
+
+    def __setitem__(self, key, value):
+        super(AccessInfo, self).__setitem__(key, value)
+        self._invalidate_service_catalog()
+
+    def __delitem__(self, key):
+        super(AccessInfo, self).__delitem__(key)
+        self._invalidate_service_catalog()
+
+    def update(self, *args, **kwargs):
+        super(AccessInfo, self).update(*args, **kwargs)
+        self._invalidate_service_catalog()
+
+    def setdefault(self, key, default=None):
+        value = super(AccessInfo, self).setdefault(key, default)
+        self._invalidate_service_catalog()
+        return value
+
+    def pop(self, *args):
+        value = super(AccessInfo, self).pop(*args)
+        self._invalidate_service_catalog()
+        return value
+
+    def popitem(self):
+        item = super(AccessInfo, self).popitem()
+        self._invalidate_service_catalog()
+        return item
+
+    def clear(self):
+        super(AccessInfo, self).clear()
+        self._invalidate_service_catalog()
+
     def has_service_catalog(self):
         return 'serviceCatalog' in self
 
+    def _expiry_text(self):
+        """Return the expiry of the token as found in its data."""
+        raise NotImplementedError()
+
+    def _get_expiry(self):
+        # the expiry may be nested in the data, where it can be modified
+        # without the instance knowing, so the text it was parsed from is
+        # kept to be compared with
+        text = self._expiry_text()
+        expiry = self._expiry
+        if expiry is None or expiry[0] is not text:
+            expires = timeutils.parse_isotime(text)
+            expiry = self._expiry = (text, expires, _utc_timestamp(expires))
+        return expiry
+
+    def seconds_until_expiry(self):
+        """Returns the number of seconds left before the token expires.
+
+        The expiry is only parsed once per token, so this is cheap enough to
+        be called before every request.
+
+        :returns: float, negative if the token has already expired
+        """
+        return self._get_expiry()[2] - _utc_timestamp(timeutils.utcnow())
+
     def will_expire_soon(self, stale_duration=None):
         """Determines if expiration is about to occur.
 
@@ -72,12 +175,7 @@ class AccessInfo(dict):
         """
         stale_duration = (STALE_TOKEN_DURATION if stale_duration is None
                           else stale_duration)
-        norm_expires = timeutils.normalize_time(self.expires)
-        # (gyee) should we move auth_token.will_expire_soon() to timeutils
-        # instead of duplicating code here?
-        soon = (timeutils.utcnow() + datetime.timedelta(
-                seconds=stale_duration))
-        return norm_expires < soon
+        return self.seconds_until_expiry() < stale_duration
 
     @classmethod
     def is_valid(cls, body, **kwargs):
@@ -142,6 +240,14 @@ class AccessInfo(dict):
         """
         raise NotImplementedError()
 
+    @property
+    def role_names(self):
+        """Returns the names of the roles granted by the authentication token.
+
+        :returns: list of str
+        """
+        raise NotImplementedError()
+
     @property
     def domain_name(self):
         """Returns the domain name associated with the authentication token.
@@ -260,10 +366,14 @@ class AccessInfoV2(AccessInfo):
        service.
     """
 
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         super(AccessInfo, self).__init__(*args, **kwargs)
-        self.update(version='v2.0')
-        self.service_catalog = service_catalog.ServiceCatalog.factory(
+        super(AccessInfo, self).update(version='v2.0')
+
+    def _build_service_catalog(self):
+        return service_catalog.ServiceCatalog.factory(
             resource_dict=self,
             token=self['token']['id'],
             region_name=self.get('region_name'))
@@ -284,9 +394,12 @@ class AccessInfoV2(AccessInfo):
     def auth_token(self):
         return self['token']['id']
 
+    def _expiry_text(self):
+        return self['token']['expires']
+
     @property
     def expires(self):
-        return timeutils.parse_isotime(self['token']['expires'])
+        return self._get_expiry()[1]
 
     @property
     def username(self):
@@ -300,6 +413,10 @@ class AccessInfoV2(AccessInfo):
     def user_domain_id(self):
         return 'default'
 
+    @property
+    def role_names(self):
+        return [role['name'] for role in self['user'].get('roles', [])]
+
     @property
     def domain_name(self):
         return None
@@ -364,15 +481,22 @@ class AccessInfoV3(AccessInfo):
        service.
     """
 
+    __slots__ = ()
+
     def __init__(self, token, *args, **kwargs):
         super(AccessInfo, self).__init__(*args, **kwargs)
-        self.update(version='v3')
-        self.service_catalog = service_catalog.ServiceCatalog.factory(
+        super(AccessInfo, self).update(version='v3')
+        if token:
+            super(AccessInfo, self).update(auth_token=token)
+
+    def __reduce__(self):
+        return (self.__class__, (self.get('auth_token'), dict(self)))
+
+    def _build_service_catalog(self):
+        return service_catalog.ServiceCatalog.factory(
             resource_dict=self,
-            token=token,
+            token=self.get('auth_token'),
             region_name=self.get('region_name'))
-        if token:
-            self.update(auth_token=token)
 
     @classmethod
     def is_valid(cls, body, **kwargs):
@@ -390,9 +514,12 @@ class AccessInfoV3(AccessInfo):
     def auth_token(self):
         return self['auth_token']
 
+    def _expiry_text(self):
+        return self['expires_at']
+
     @property
     def expires(self):
-        return timeutils.parse_isotime(self['expires_at'])
+        return self._get_expiry()[1]
 
     @property
     def user_id(self):
@@ -406,6 +533,10 @@ class AccessInfoV3(AccessInfo):
     def username(self):
         return self['user']['name']
 
+    @property
+    def role_names(self):
+        return [role['name'] for role in self.get('roles', [])]
+
     @property
     def domain_name(self):
         domain = self.get('domain')
@@ -122,6 +122,10 @@ class BaseAuthPlugin(object):
         "auth_url",
     ]
 
+    # balancing.EndpointSelector spreading the requests across the matching
+    # endpoints, None to always use the same one
+    endpoint_selector = None
+
     def __init__(self, auth_system=None, **kwargs):
         self.auth_system = auth_system or self.auth_system
         self.opts = dict((name, kwargs.get(name))
@@ -211,6 +215,22 @@ class BaseAuthPlugin(object):
         if missing:
             raise exceptions.AuthPluginOptionsMissing(missing)
 
+    def report_endpoint(self, endpoint, elapsed=None, error=None):
+        """Report the outcome of a request sent to `endpoint`.
+
+        Called by HTTPClient when an endpoint_selector is set.
+
+        :param elapsed: seconds the response took, if one was received
+        :param error: the connection error raised otherwise
+        """
+        if self.endpoint_selector is None:
+            return
+        if error is None:
+            self.endpoint_selector.report_success(endpoint, elapsed)
+        else:
+            logger.warning("Request to %s failed: %s", endpoint, error)
+            self.endpoint_selector.report_failure(endpoint)
+
     @abc.abstractmethod
     def token_and_endpoint(self, endpoint_type, service_type):
         """Return token and endpoint.
@@ -0,0 +1,104 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Selection of an endpoint among the equivalent ones of a service catalog.
+
+An :class:`EndpointSelector` assigned to `BaseAuthPlugin.endpoint_selector`
+makes HTTPClient spread its requests across all the endpoints matching a
+request instead of always sending them to the first one.
+"""
+
+import threading
+import time
+
+
+ROUND_ROBIN = 'round-robin'
+LEAST_LATENCY = 'least-latency'
+STRATEGIES = (ROUND_ROBIN, LEAST_LATENCY)
+
+# seconds an endpoint is left out of the selection after a connection error
+EJECTION_COOLDOWN = 30
+
+# weight of the last request in the average latency of an endpoint
+LATENCY_WEIGHT = 0.3
+
+
+class EndpointSelector(object):
+    """Spread the requests across equivalent endpoints.
+
+    The health of the endpoints is tracked passively, from the outcome of
+    the requests reported by HTTPClient: an endpoint is ejected after a
+    connection error and tried again once `cooldown` seconds have elapsed.
+    When all the endpoints are ejected, they are all selected again rather
+    than failing without trying.
+
+    :param strategy: ROUND_ROBIN to take the endpoints in turn, or
+        LEAST_LATENCY to take the one with the lowest average latency, those
+        without latency measured yet first
+    :param cooldown: seconds an endpoint is ejected for
+    """
+
+    def __init__(self, strategy=ROUND_ROBIN, cooldown=EJECTION_COOLDOWN):
+        if strategy not in STRATEGIES:
+            raise ValueError("Unknown endpoint selection strategy %r, "
+                             "expected one of: %s" %
+                             (strategy, ', '.join(STRATEGIES)))
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._turns = {}
+        self._ejected = {}
+        self._latencies = {}
+
+    def select(self, urls):
+        """Return one of `urls`, None if there are none."""
+        if len(urls) < 2:
+            return urls[0] if urls else None
+
+        now = time.time()
+        with self._lock:
+            candidates = [url for url in urls
+                          if self._ejected.get(url, 0) <= now] or urls
+            if self.strategy == LEAST_LATENCY:
+                return min(candidates,
+                           key=lambda url: self._latencies.get(url, 0))
+            key = tuple(urls)
+            turn = self._turns.get(key, 0)
+            self._turns[key] = turn + 1
+            return candidates[turn % len(candidates)]
+
+    def report_success(self, url, elapsed=None):
+        """Record that a response was received from `url`.
+
+        :param elapsed: seconds the response took, if known
+        """
+        with self._lock:
+            self._ejected.pop(url, None)
+            if elapsed is not None:
+                latency = self._latencies.get(url)
+                if latency is not None:
+                    elapsed = (LATENCY_WEIGHT * elapsed +
+                               (1 - LATENCY_WEIGHT) * latency)
+                self._latencies[url] = elapsed
+
+    def report_failure(self, url):
+        """Record that `url` could not be reached, ejecting it."""
+        with self._lock:
+            self._ejected[url] = time.time() + self.cooldown
+            self._latencies.pop(url, None)
+
+    def is_ejected(self, url):
+        with self._lock:
+            return self._ejected.get(url, 0) > time.time()
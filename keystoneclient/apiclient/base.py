@@ -26,13 +26,38 @@ Base utilities to build API operation managers and objects on top of.
 # pylint: disable=E1102
 
 import abc
+import codecs
+import collections
+import copy
 import functools
+import json
+import re
+import sys
+import threading
+import time
 import urllib
+import urlparse
+
+import six
 
 from keystoneclient.apiclient import exceptions
 from keystoneclient.openstack.common import strutils
 
 
+# size of the chunks read from streamed responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# default maximum number of entities held by an EntityCache
+ENTITY_CACHE_SIZE = 1000
+
+# default number of calls run at once by map_concurrently(), matches the
+# default number of connections kept per host by requests
+CONCURRENCY = 10
+
+_json_decoder = json.JSONDecoder()
+_json_whitespace = re.compile(r'\s*')
+
+
 def getid(obj):
     """Return id if argument is a Resource.
 
@@ -50,6 +75,211 @@ def getid(obj):
         return obj
 
 
+class _JSONStream(object):
+    """Incremental reader of a JSON document received in chunks.
+
+    Only the part of the document which has not been decoded yet is kept
+    in memory.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = u''
+        self.pos = 0
+
+    def read_more(self):
+        """Append the next chunk to the buffer, return False at the end."""
+        for chunk in self.chunks:
+            if not chunk:
+                continue
+            self.buf = self.buf[self.pos:] + self.decoder.decode(chunk)
+            self.pos = 0
+            return True
+        return False
+
+    def peek(self):
+        """Return the next non whitespace character, None at the end."""
+        while True:
+            self.pos = _json_whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.read_more():
+                return None
+
+    def expect(self, chars):
+        char = self.peek()
+        if char is None or char not in chars:
+            raise ValueError('Expected one of %r at offset %d of the '
+                             'streamed JSON' % (chars, self.pos))
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        """Decode the next complete value of the document."""
+        self.peek()
+        while True:
+            try:
+                value, end = _json_decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                value, end = None, None
+            # a value at the end of the buffer, e.g. a number, may still
+            # continue in the next chunk
+            if end is not None and (
+                    _json_whitespace.match(self.buf, end).end() <
+                    len(self.buf)):
+                self.pos = end
+                return value
+            if not self.read_more():
+                if end is None:
+                    raise ValueError('Truncated JSON document')
+                self.pos = end
+                return value
+
+
+def iter_json_collection(chunks, response_key):
+    """Yield the items of a collection from a JSON document read in chunks.
+
+    The document is expected to be an object with the collection under
+    `response_key`, e.g. ``{"users": [{...}, {...}], "links": {...}}``.
+    Items of the collection are decoded and yielded one at a time, so that
+    memory use does not depend on the size of the collection.
+
+    :param chunks: iterable of the bytes of the document
+    :param response_key: the key of the collection in the document
+    :raises KeyError: if the document has no `response_key`
+    """
+    stream = _JSONStream(chunks)
+    stream.expect('{')
+    if stream.peek() == '}':
+        raise KeyError(response_key)
+    while True:
+        key = stream.decode_value()
+        stream.expect(':')
+        if key != response_key:
+            stream.decode_value()
+        elif stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                return
+            while True:
+                yield stream.decode_value()
+                if stream.expect(',]') == ']':
+                    return
+        else:
+            # NOTE(ja): keystone returns values as list as
+            #           {'values': [ ... ]}, decode it at once
+            data = stream.decode_value()
+            try:
+                data = data['values']
+            except (KeyError, TypeError):
+                pass
+            for item in data:
+                yield item
+            return
+        if stream.expect(',}') == '}':
+            raise KeyError(response_key)
+
+
+def _call_in_background(func, *args, **kwargs):
+    """Start calling `func` in a thread.
+
+    :returns: a callable waiting for the call to complete and returning its
+        result, or raising its exception
+    """
+    result = {}
+
+    def run():
+        try:
+            result['value'] = func(*args, **kwargs)
+        except Exception:
+            result['error'] = sys.exc_info()
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+
+    def wait():
+        thread.join()
+        if 'error' in result:
+            six.reraise(*result['error'])
+        return result['value']
+    return wait
+
+
+def map_concurrently(func, iterable, max_workers=CONCURRENCY,
+                     return_exceptions=False):
+    """Call `func` on every item of `iterable` from a pool of threads.
+
+    Meant for fanning out requests, e.g. one per project, through the
+    managers of a single client: the calls then share its connection pool
+    and its token.
+
+    Unless `return_exceptions` is set, the items not processed yet are
+    skipped once a call fails.
+
+    :param max_workers: maximum number of calls running at once
+    :param return_exceptions: return the exceptions raised by the calls in
+        place of their results instead of raising them
+    :returns: list of the results, in the order of `iterable`
+    :raises: the exception of the first item whose call failed
+    """
+    items = list(iterable)
+    results = [None] * len(items)
+    errors = []
+    pending = six.moves.queue.Queue()
+    for index in range(len(items)):
+        pending.put(index)
+
+    def work():
+        while not errors:
+            try:
+                index = pending.get_nowait()
+            except six.moves.queue.Empty:
+                return
+            try:
+                results[index] = func(items[index])
+            except Exception as ex:
+                if return_exceptions:
+                    results[index] = ex
+                else:
+                    errors.append((index, sys.exc_info()))
+
+    workers = [threading.Thread(target=work)
+               for i in range(min(max_workers, len(items)))]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    if errors:
+        six.reraise(*min(errors)[1])
+    return results
+
+
+def _next_link(links):
+    """Return the next page link from the links of a response, if any.
+
+    Links are either a dict, e.g. {"next": url}, or a list of link objects,
+    e.g. [{"rel": "next", "href": url}].
+    """
+    if isinstance(links, dict):
+        return links.get('next')
+    for link in links or []:
+        if link.get('rel') == 'next' and link.get('href'):
+            return link['href']
+
+
+def _set_query_params(url, **params):
+    """Return `url` with the given query parameters set."""
+    parts = urlparse.urlsplit(url)
+    query = [(k, v) for (k, v) in urlparse.parse_qsl(parts.query)
+             if k not in params]
+    query.extend(sorted(params.items()))
+    return urlparse.urlunsplit(parts._replace(query=urllib.urlencode(query)))
+
+
 # TODO(aababilov): call run_hooks() in HookableMixin's child classes
 class HookableMixin(object):
     """Mixin so classes can register and run hooks."""
@@ -82,6 +312,73 @@ class HookableMixin(object):
             hook_func(*args, **kwargs)
 
 
+def _url_path(url):
+    return url.split('?', 1)[0].rstrip('/')
+
+
+class EntityCache(object):
+    """Cache of the entities read by the managers of a client, keyed by URL.
+
+    Entries expire `ttl` seconds after being stored, and the least recently
+    used ones are evicted once there are more than `max_size`. The writes
+    made through the managers drop the entries they may have made stale,
+    see invalidate().
+
+    Assign an instance to the `entity_cache` attribute of a client to have
+    its managers use it.
+    """
+
+    def __init__(self, ttl, max_size=ENTITY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, url):
+        """Return a copy of the entity stored for `url`, or None."""
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                return None
+            # keep the entries ordered from least to most recently used
+            self._entries[url] = entry
+        return copy.deepcopy(entry[1])
+
+    def set(self, url, info):
+        """Store a copy of the entity read from `url`."""
+        entry = (time.time() + self.ttl, copy.deepcopy(info))
+        with self._lock:
+            self._entries.pop(url, None)
+            self._entries[url] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url):
+        """Drop the entries a write to `url` may have made stale.
+
+        These are the entries for `url` itself, for the URLs below it (e.g.
+        the members of a collection a POST is made to) and for the URLs
+        above it (e.g. the entity a sub-resource belongs to).
+        """
+        path = _url_path(url)
+        with self._lock:
+            for key in list(self._entries):
+                key_path = _url_path(key)
+                if (key_path == path or key_path.startswith(path + '/') or
+                        path.startswith(key_path + '/')):
+                    del self._entries[key]
+
+    def clear(self):
+        """Drop all the entries."""
+        with self._lock:
+            self._entries.clear()
+
+
 def filter_kwargs(f):
     @functools.wraps(f)
     def func(*args, **kwargs):
@@ -127,7 +424,18 @@ class BaseManager(HookableMixin):
         """
         return self.client
 
-    def _list(self, url, response_key, obj_class=None, json=None):
+    @property
+    def _entity_cache(self):
+        return getattr(self.client, 'entity_cache', None)
+
+    def _invalidate_cached(self, url):
+        """Drop the cached entities a write to `url` may make stale."""
+        cache = self._entity_cache
+        if cache is not None:
+            cache.invalidate(url)
+
+    def _list(self, url, response_key, obj_class=None, json=None,
+              stream=False):
         """List the collection.
 
         :param url: a partial URL, e.g., '/servers'
@@ -137,15 +445,26 @@ class BaseManager(HookableMixin):
             (self.resource_class will be used by default)
         :param json: data that will be encoded as JSON and passed in POST
             request (GET will be sent by default)
+        :param stream: return a generator which decodes the collection from
+            the response as it is received and yields the objects one at a
+            time, instead of a list. Memory use then does not depend on the
+            size of the collection.
         """
+        if obj_class is None:
+            obj_class = self.resource_class
+
+        if stream:
+            if json:
+                resp = self.client.post(url, json=json, stream=True)
+            else:
+                resp = self.client.get(url, stream=True)
+            return self._iter_list(resp, response_key, obj_class)
+
         if json:
             body = self.client.post(url, json=json).json()
         else:
             body = self.client.get(url).json()
 
-        if obj_class is None:
-            obj_class = self.resource_class
-
         data = body[response_key]
         # NOTE(ja): keystone returns values as list as {'values': [ ... ]}
         #           unlike other services which just return the list...
@@ -156,6 +475,107 @@ class BaseManager(HookableMixin):
 
         return [obj_class(self, res, loaded=True) for res in data if res]
 
+    def _iter_list(self, resp, response_key, obj_class):
+        try:
+            for res in iter_json_collection(
+                    resp.iter_content(STREAM_CHUNK_SIZE), response_key):
+                if res:
+                    yield obj_class(self, res, loaded=True)
+        finally:
+            resp.close()
+
+    def _list_pages(self, url, response_key, obj_class=None, page_size=None,
+                    prefetch=True):
+        """Iterate over all the objects of a paginated collection.
+
+        Pages are followed through the `links.next` or `<response_key>_links`
+        links of the responses. When `page_size` is given, it is sent as
+        `limit`, and if the response has no next link, the next page is
+        requested with the id of the last object as `marker` as long as
+        pages are full. The iteration stops when a page requested with a
+        marker holds the object of that marker, i.e. the server ignored it.
+
+        :param url: a partial URL, e.g., '/servers'
+        :param response_key: the key to be looked up in response dictionary,
+            e.g., 'servers'
+        :param obj_class: class for constructing the returned objects
+            (self.resource_class will be used by default)
+        :param page_size: number of objects requested per page
+        :param prefetch: request the next page in a background thread while
+            the objects of the current page are consumed
+        """
+        if obj_class is None:
+            obj_class = self.resource_class
+        if page_size:
+            url = _set_query_params(url, limit=page_size)
+
+        page = self._get_page(url, response_key, page_size)
+        while True:
+            data, next_url = page
+            if next_url and prefetch:
+                next_page = _call_in_background(
+                    self._get_page, next_url, response_key, page_size)
+            for res in data:
+                yield obj_class(self, res, loaded=True)
+            if not next_url:
+                return
+            if prefetch:
+                page = next_page()
+            else:
+                page = self._get_page(next_url, response_key, page_size)
+
+    def _get_page(self, url, response_key, page_size=None):
+        """Get a page of a collection.
+
+        :returns: tuple of the page data and of the URL of the next page, or
+            None on the last page
+        """
+        body = self.client.get(url).json()
+        data = body[response_key]
+        links = [body.get('links'), body.get('%s_links' % response_key)]
+        try:
+            links.append(data.get('links'))
+            data = data['values']
+        except (AttributeError, KeyError):
+            pass
+        data = [res for res in data if res]
+
+        marker = dict(urlparse.parse_qsl(urlparse.urlsplit(url).query)).get(
+            'marker')
+        if marker is not None and any(str(res.get('id')) == marker
+                                      for res in data):
+            # the server ignored the marker and sent a page which was
+            # already seen
+            return [], None
+
+        next_url = None
+        for link in links:
+            next_url = next_url or _next_link(link)
+        if next_url:
+            next_url = self._relative_url(next_url)
+        elif page_size and len(data) >= page_size:
+            next_url = _set_query_params(url, marker=data[-1]['id'])
+
+        if next_url == url:
+            # guard against a server linking a page to itself
+            next_url = None
+        return data, next_url
+
+    def _relative_url(self, url):
+        """Convert a link returned by the server to a partial URL."""
+        parts = urlparse.urlsplit(url)
+        if not parts.scheme:
+            return url
+        path = parts.path
+        endpoint = getattr(self.client, 'cached_endpoint', None)
+        if endpoint:
+            endpoint_path = urlparse.urlsplit(endpoint).path.rstrip('/')
+            if endpoint_path and path.startswith(endpoint_path):
+                path = path[len(endpoint_path):]
+        if parts.query:
+            path += '?' + parts.query
+        return path
+
     def _get(self, url, response_key):
         """Get an object from collection.
 
@@ -163,7 +583,15 @@ class BaseManager(HookableMixin):
         :param response_key: the key to be looked up in response dictionary,
             e.g., 'server'
         """
+        cache = self._entity_cache
+        if cache is not None:
+            info = cache.get(url)
+            if info is not None:
+                return self.resource_class(self, info, loaded=True)
+
         body = self.client.get(url).json()
+        if cache is not None:
+            cache.set(url, body[response_key])
         return self.resource_class(self, body[response_key], loaded=True)
 
     def _head(self, url):
@@ -186,6 +614,7 @@ class BaseManager(HookableMixin):
             Python object of self.resource_class
         """
         body = self.client.post(url, json=json).json()
+        self._invalidate_cached(url)
         if return_raw:
             return body[response_key]
         return self.resource_class(self, body[response_key])
@@ -200,6 +629,7 @@ class BaseManager(HookableMixin):
             e.g., 'servers'
         """
         resp = self.client.put(url, json=json)
+        self._invalidate_cached(url)
         # PUT requests may not return a body
         if resp.content:
             body = resp.json()
@@ -218,6 +648,7 @@ class BaseManager(HookableMixin):
             e.g., 'servers'
         """
         body = self.client.patch(url, json=json).json()
+        self._invalidate_cached(url)
         if response_key is not None:
             return self.resource_class(self, body[response_key])
         else:
@@ -228,7 +659,9 @@ class BaseManager(HookableMixin):
 
         :param url: a partial URL, e.g., '/servers/my-server'
         """
-        return self.client.delete(url)
+        resp = self.client.delete(url)
+        self._invalidate_cached(url)
+        return resp
 
     def _create(self, url, body, response_key, return_raw=False):
         """Deprecated. Use `_post` instead.
@@ -253,15 +686,65 @@ class ManagerWithFind(BaseManager):
 
     __metaclass__ = abc.ABCMeta
 
+    # attributes the server can filter the collection on, see findall()
+    filter_attributes = ()
+
     @abc.abstractmethod
     def list(self):
         pass
 
+    def _list_filtered(self, **filters):
+        """List the items matching ``**filters`` using server-side filtering.
+
+        Only called with attributes listed in `filter_attributes`. Managers
+        declaring any override this, returning None when the filters cannot
+        be applied by the server at the moment.
+        """
+        return None
+
+    def _query_filtered(self, url, filters, response_key, collection_key):
+        """Request the collection filtered with the given query parameters.
+
+        Keystone answers some filtered requests with the single matching
+        item under `response_key` rather than a list under
+        `collection_key`, and with a 404 when nothing matches; all of these
+        are handled.
+
+        :returns: list of the matching items
+        """
+        params = dict((attr, strutils.safe_encode(value)
+                       if isinstance(value, six.string_types) else value)
+                      for (attr, value) in filters.items())
+        try:
+            body = self.client.get(
+                '%s?%s' % (url, urllib.urlencode(params))).json()
+        except exceptions.NotFound:
+            return []
+
+        if response_key in body:
+            data = [body[response_key]]
+        else:
+            data = body[collection_key]
+            try:
+                data = data['values']
+            except (KeyError, TypeError):
+                pass
+        return [self.resource_class(self, res, loaded=True)
+                for res in data if res]
+
+    def iter_all(self, *args, **kwargs):
+        """Iterate over all the items of the collection.
+
+        Managers of paginated collections override this to request the
+        collection page by page, by default the result of list() is
+        iterated.
+        """
+        return iter(self.list(*args, **kwargs))
+
     def find(self, **kwargs):
         """Find a single item with attributes matching ``**kwargs``.
 
-        This isn't very efficient: it loads the entire list then filters on
-        the Python side.
+        See findall() for how the items are filtered.
         """
         matches = self.findall(**kwargs)
         num_matches = len(matches)
@@ -276,13 +759,23 @@ class ManagerWithFind(BaseManager):
     def findall(self, **kwargs):
         """Find all items with attributes matching ``**kwargs``.
 
-        This isn't very efficient: it loads the entire list then filters on
-        the Python side.
+        Filters on the attributes listed in `filter_attributes` are sent to
+        the server so that only the matching items are transferred. When
+        there are none, or the server cannot apply them, the entire list is
+        loaded. Either way, the items are then filtered on the Python side.
         """
         found = []
         searches = kwargs.items()
 
-        for obj in self.list():
+        candidates = None
+        filters = dict((attr, value) for (attr, value) in searches
+                       if attr in self.filter_attributes)
+        if filters:
+            candidates = self._list_filtered(**filters)
+        if candidates is None:
+            candidates = self.list()
+
+        for obj in candidates:
             try:
                 if all(getattr(obj, attr) == value
                        for (attr, value) in searches):
@@ -349,6 +842,19 @@ class CrudManager(BaseManager):
             {self.key: kwargs},
             self.key)
 
+    def create_many(self, items, max_workers=CONCURRENCY):
+        """Create several entities, sending the requests concurrently.
+
+        :param items: the keyword arguments of create() for each entity
+        :param max_workers: maximum number of requests sent at once
+        :returns: list of the created entities, in the order of `items`,
+            holding the exception raised in place of the entities which
+            could not be created
+        """
+        return map_concurrently(lambda kwargs: self.create(**kwargs),
+                                items, max_workers=max_workers,
+                                return_exceptions=True)
+
     @filter_kwargs
     def get(self, **kwargs):
         return self._get(
@@ -360,10 +866,30 @@ class CrudManager(BaseManager):
         return self._head(self.build_url(dict_args_in_out=kwargs))
 
     @filter_kwargs
-    def list(self, **kwargs):
+    def list(self, stream=False, **kwargs):
+        """List the collection, filtered by `kwargs`.
+
+        :param stream: return a generator yielding the entities as the
+            response is decoded, see BaseManager._list()
+        """
         url = self.build_url(dict_args_in_out=kwargs)
 
         return self._list(
+            '%(url)s%(query)s' % {
+                'url': url,
+                'query': '?%s' % urllib.urlencode(kwargs) if kwargs else '',
+            },
+            self.collection_key,
+            stream=stream)
+
+    @filter_kwargs
+    def iter_all(self, **kwargs):
+        """Iterate over all the items of the collection, following the
+        `links.next` link of each page.
+        """
+        url = self.build_url(dict_args_in_out=kwargs)
+
+        return self._list_pages(
             '%(url)s%(query)s' % {
                 'url': url,
                 'query': '?%s' % urllib.urlencode(kwargs) if kwargs else '',
@@ -391,6 +917,25 @@ class CrudManager(BaseManager):
         return self._delete(
             self.build_url(dict_args_in_out=kwargs))
 
+    def delete_many(self, entities, max_workers=CONCURRENCY, **kwargs):
+        """Delete several entities, sending the requests concurrently.
+
+        :param entities: the entities or ids of the entities to delete
+        :param max_workers: maximum number of requests sent at once
+        :param kwargs: passed to delete() along with each entity, e.g. the
+            `base_url` or the parent entities
+        :returns: list of the responses, in the order of `entities`, holding
+            the exception raised in place of the entities which could not be
+            deleted
+        """
+        def delete(entity):
+            entity_kwargs = dict(kwargs)
+            entity_kwargs['%s_id' % self.key] = getid(entity)
+            return self.delete(**entity_kwargs)
+
+        return map_concurrently(delete, entities, max_workers=max_workers,
+                                return_exceptions=True)
+
     @filter_kwargs
     def find(self, **kwargs):
         """
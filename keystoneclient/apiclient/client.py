@@ -27,7 +27,9 @@ OpenStack Client interface. Handles the REST calls and responses.
 # E0202: An attribute inherited from %s hide this method
 # pylint: disable=E0202
 
+import collections
 import logging
+import threading
 import time
 
 try:
@@ -38,11 +40,76 @@ except ImportError:
 import requests
 
 from keystoneclient.apiclient import exceptions
+from keystoneclient.apiclient import instrumentation
 from keystoneclient.openstack.common import importutils
 
 
 _logger = logging.getLogger(__name__)
 
+# sessions shared by HTTPClients, see get_shared_session()
+_shared_sessions = {}
+_shared_sessions_lock = threading.Lock()
+
+# seconds before a token still about to expire is renewed again, after its
+# renewal failed or gave a token expiring as soon
+RENEWAL_RETRY_INTERVAL = 60
+
+
+class PooledSession(requests.Session):
+    """Session with tunable connection pools.
+
+    :param pool_connections: number of hosts connection pools are kept for
+    :param pool_maxsize: maximum number of connections kept per host
+    :param pool_block: whether requests wait for a connection to be returned
+        to a full pool instead of opening one which is not kept
+    :param pool_idle_timeout: seconds after which kept-alive connections
+        left unused are dropped rather than reused, as the server may have
+        closed them meanwhile
+    """
+
+    def __init__(self, pool_connections=None, pool_maxsize=None,
+                 pool_block=False, pool_idle_timeout=None):
+        super(PooledSession, self).__init__()
+        adapter_kwargs = {"pool_block": pool_block}
+        if pool_connections:
+            adapter_kwargs["pool_connections"] = pool_connections
+        if pool_maxsize:
+            adapter_kwargs["pool_maxsize"] = pool_maxsize
+        for prefix in ("https://", "http://"):
+            self.mount(prefix,
+                       requests.adapters.HTTPAdapter(**adapter_kwargs))
+        self.pool_idle_timeout = pool_idle_timeout
+        self._last_used = None
+
+    def request(self, method, url, *args, **kwargs):
+        if self.pool_idle_timeout is not None:
+            now = time.time()
+            if (self._last_used is not None and
+                    now - self._last_used > self.pool_idle_timeout):
+                # connections in use are closed once returned to the pools
+                self.close()
+            self._last_used = now
+        return super(PooledSession, self).request(
+            method, url, *args, **kwargs)
+
+
+def get_shared_session(key, **pool_options):
+    """Return the session shared by all the HTTPClients for `key`.
+
+    Clients using the same key, e.g. the endpoint they talk to, and pool
+    options reuse the same connection pools.
+
+    :param key: hashable identifying the clients sharing the session
+    :param pool_options: arguments of :class:`PooledSession`
+    """
+    registry_key = (key, tuple(sorted(pool_options.items())))
+    with _shared_sessions_lock:
+        session = _shared_sessions.get(registry_key)
+        if session is None:
+            session = PooledSession(**pool_options)
+            _shared_sessions[registry_key] = session
+        return session
+
 
 class HTTPClient(object):
     """This client handles sending HTTP requests to OpenStack servers.
@@ -50,12 +117,13 @@ class HTTPClient(object):
     Features:
     - share authentication information between several clients to different
       services (e.g., for compute and image clients);
-    - reissue authentication request for expired tokens;
+    - reissue authentication request for expired tokens, renewing them
+      before they expire, once for all the threads sharing the client;
     - encode/decode JSON bodies;
     - raise exeptions on HTTP errors;
     - pluggable authentication;
     - store authentication information in a keyring;
-    - store time spent for requests;
+    - store time spent for requests, and report them to observers;
     - register clients for particular services, so one can use
       `http_client.identity` or `http_client.compute`;
     - log requests and responses in a format that is easy to copy-and-paste
@@ -76,8 +144,20 @@ class HTTPClient(object):
                  keyring_saver=None,
                  debug=False,
                  user_agent=None,
-                 http=None):
+                 http=None,
+                 stale_duration=None,
+                 pool_connections=None,
+                 pool_maxsize=None,
+                 pool_block=False,
+                 pool_idle_timeout=None,
+                 json_codec=None,
+                 observers=None):
         self.auth_plugin = auth_plugin
+        # module or object providing dumps(), used to encode request bodies
+        self.json_codec = json_codec or json
+        # seconds before expiry at which tokens are renewed, see
+        # AccessInfo.will_expire_soon()
+        self.stale_duration = stale_duration
 
         self.endpoint_type = endpoint_type
         self.region_name = region_name
@@ -91,13 +171,34 @@ class HTTPClient(object):
         self.debug = debug
         self.user_agent = user_agent or self.user_agent
 
-        self.times = []  # [("item", starttime, endtime), ...]
+        # [("item", starttime, endtime), ...] for the last requests
+        self.times = collections.deque(maxlen=instrumentation.TIMINGS_SIZE)
         self.timings = timings
+        # tuple replaced on updates, so that it can be iterated while
+        # observers are added from other threads
+        self.observers = tuple(observers or ())
 
         # requests within the same session can reuse TCP connections from pool
-        self.http = http or requests.Session()
+        if http is None:
+            if (pool_connections or pool_maxsize or pool_block or
+                    pool_idle_timeout is not None):
+                http = PooledSession(pool_connections=pool_connections,
+                                     pool_maxsize=pool_maxsize,
+                                     pool_block=pool_block,
+                                     pool_idle_timeout=pool_idle_timeout)
+            else:
+                http = requests.Session()
+        self.http = http
 
         self.cached_token = None
+        # serializes authentications, so that the threads needing a new
+        # token at the same time wait for a single one
+        self._auth_lock = threading.RLock()
+        # number of authentications done, lets the waiting threads tell
+        # whether the token was renewed while they were waiting
+        self._auth_generation = 0
+        # time before which tokens about to expire are not renewed again
+        self._renewal_not_before = 0
         if self.debug and not _logger.handlers:
             # Logging level is already set on the root logger
             ch = logging.StreamHandler()
@@ -113,7 +214,7 @@ class HTTPClient(object):
                 rql.setLevel(logging.WARNING)
 
     def _http_log_req(self, method, url, kwargs):
-        if not self.debug:
+        if not (self.debug and _logger.isEnabledFor(logging.DEBUG)):
             return
 
         string_parts = [
@@ -126,12 +227,12 @@ class HTTPClient(object):
             header = "-H '%s: %s'" % (element, kwargs['headers'][element])
             string_parts.append(header)
 
-        _logger.debug("REQ: %s" % " ".join(string_parts))
+        _logger.debug("REQ: %s", " ".join(string_parts))
         if 'data' in kwargs:
-            _logger.debug("REQ BODY: %s\n" % (kwargs['data']))
+            _logger.debug("REQ BODY: %s\n", kwargs['data'])
 
     def _http_log_resp(self, resp):
-        if not self.debug:
+        if not (self.debug and _logger.isEnabledFor(logging.DEBUG)):
             return
         _logger.debug(
             "RESP: [%s] %s\n",
@@ -143,19 +244,16 @@ class HTTPClient(object):
                 resp.text)
 
     def serialize(self, kwargs):
-        if kwargs.get('json') is not None:
+        body = kwargs.pop('json', None)
+        if body is not None:
             kwargs['headers']['Content-Type'] = 'application/json'
-            kwargs['data'] = json.dumps(kwargs['json'])
-        try:
-            del kwargs['json']
-        except KeyError:
-            pass
+            kwargs['data'] = self.json_codec.dumps(body)
 
     def get_timings(self):
-        return self.times
+        return list(self.times)
 
     def reset_timings(self):
-        self.times = []
+        self.times.clear()
 
     def request(self, method, url, **kwargs):
         """Send an http request with the specified characteristics.
@@ -169,10 +267,10 @@ class HTTPClient(object):
 '            requests.Session.request (such as `headers`) or `json`
              that will be encoded as JSON and used as `data` argument
         """
-        kwargs.setdefault("headers", kwargs.get("headers", {}))
-        kwargs["headers"]["User-Agent"] = self.user_agent
+        headers = kwargs.setdefault("headers", {})
+        headers["User-Agent"] = self.user_agent
         if self.original_ip:
-            kwargs["headers"]["Forwarded"] = "for=%s;by=%s" % (
+            headers["Forwarded"] = "for=%s;by=%s" % (
                 self.original_ip, self.user_agent)
         if self.timeout is not None:
             kwargs.setdefault("timeout", self.timeout)
@@ -182,12 +280,10 @@ class HTTPClient(object):
         self.serialize(kwargs)
 
         self._http_log_req(method, url, kwargs)
-        if self.timings:
-            start_time = time.time()
-        resp = self.http.request(method, url, **kwargs)
-        if self.timings:
-            self.times.append(("%s %s" % (method, url),
-                               start_time, time.time()))
+        if not (self.timings or self.observers):
+            resp = self.http.request(method, url, **kwargs)
+        else:
+            resp = self._instrumented_request(method, url, kwargs)
         self._http_log_resp(resp)
 
         if resp.status_code >= 400:
@@ -198,6 +294,42 @@ class HTTPClient(object):
 
         return resp
 
+    def _instrumented_request(self, method, url, kwargs):
+        record = instrumentation.RequestRecord(method, url,
+                                               kwargs.get("data"))
+        self._notify_observers("before_request", record)
+        try:
+            resp = self.http.request(method, url, **kwargs)
+        except Exception as ex:
+            record.finish(error=ex)
+            self._notify_observers("after_request", record)
+            raise
+        record.finish(resp)
+        if self.timings:
+            self.times.append(("%s %s" % (method, url),
+                               record.start, record.end))
+        self._notify_observers("after_request", record)
+        return resp
+
+    def _notify_observers(self, event, record):
+        """Call the `event` method of the observers, logging their errors."""
+        for observer in self.observers:
+            try:
+                getattr(observer, event)(record)
+            except Exception:
+                _logger.exception("Request observer %r failed", observer)
+
+    def add_observer(self, observer):
+        """Register an observer of the requests sent.
+
+        :param observer: instance of
+            :class:`keystoneclient.apiclient.instrumentation.RequestObserver`
+        """
+        self.observers = self.observers + (observer,)
+
+    def remove_observer(self, observer):
+        self.observers = tuple(o for o in self.observers if o is not observer)
+
     @staticmethod
     def concat_url(endpoint, url):
         """Concatenate endpoint and final URL.
@@ -227,8 +359,16 @@ class HTTPClient(object):
             "endpoint_type": client.endpoint_type or self.endpoint_type,
             "service_type": client.service_type,
         }
+        generation = self._auth_generation
         token, endpoint = (self.cached_token, client.cached_endpoint)
+        if self.auth_plugin.endpoint_selector is not None:
+            # the plugin picks the endpoint of each request
+            endpoint = None
         just_authenticated = False
+        if (self._token_expires_soon() and
+                time.time() >= self._renewal_not_before):
+            just_authenticated = self._renew_token(generation)
+            token = None
         if not (token and endpoint):
             try:
                 token, endpoint = self.auth_plugin.token_and_endpoint(
@@ -236,7 +376,7 @@ class HTTPClient(object):
             except exceptions.EndpointException:
                 pass
             if not (token and endpoint):
-                self.authenticate()
+                self._reauthenticate(generation)
                 just_authenticated = True
                 token, endpoint = self.auth_plugin.token_and_endpoint(
                     **filter_args)
@@ -252,14 +392,13 @@ class HTTPClient(object):
         # might be because the auth token expired, so try to
         # re-authenticate and try again. If it still fails, bail.
         try:
-            return self.request(
-                method, self.concat_url(endpoint, url), **kwargs)
+            return self._endpoint_request(endpoint, method, url, kwargs)
         except exceptions.Unauthorized as unauth_ex:
             if just_authenticated:
                 raise
             self.cached_token = None
             client.cached_endpoint = None
-            self.authenticate()
+            self._reauthenticate(generation)
             try:
                 token, endpoint = self.auth_plugin.token_and_endpoint(
                     **filter_args)
@@ -271,9 +410,76 @@ class HTTPClient(object):
             self.cached_token = token
             client.cached_endpoint = endpoint
             kwargs["headers"]["X-Auth-Token"] = token
+            return self._endpoint_request(endpoint, method, url, kwargs)
+
+    def _endpoint_request(self, endpoint, method, url, kwargs):
+        """Send a request to `endpoint`, reporting how it went if needed."""
+        if self.auth_plugin.endpoint_selector is None:
             return self.request(
                 method, self.concat_url(endpoint, url), **kwargs)
 
+        try:
+            resp = self.request(
+                method, self.concat_url(endpoint, url), **kwargs)
+        except exceptions.HTTPError:
+            # the endpoint did answer
+            self.auth_plugin.report_endpoint(endpoint)
+            raise
+        except (requests.ConnectionError, requests.Timeout) as ex:
+            self.auth_plugin.report_endpoint(endpoint, error=ex)
+            raise
+        elapsed = getattr(resp, "elapsed", None)
+        self.auth_plugin.report_endpoint(
+            endpoint, elapsed=elapsed.total_seconds() if elapsed else None)
+        return resp
+
+    def _token_expires_soon(self):
+        access_info = getattr(self.auth_plugin, "access_info", None)
+        if not access_info:
+            return False
+        try:
+            return access_info.will_expire_soon(self.stale_duration)
+        except (KeyError, TypeError, ValueError):
+            # the token carries no usable expiry, it is renewed once
+            # rejected
+            return False
+
+    def _reauthenticate(self, generation):
+        """Authenticate unless it was done since `generation`.
+
+        Threads finding the token they used rejected or about to expire all
+        call this, only the first one authenticates while the others wait
+        for it and then use the new token.
+
+        :param generation: value of `_auth_generation` when the token
+            needing renewal was read
+        """
+        with self._auth_lock:
+            if self._auth_generation == generation:
+                self.authenticate()
+
+    def _renew_token(self, generation):
+        """Renew the token before it expires.
+
+        Failing to do so is not fatal, the current token may still be
+        accepted. The renewal is not attempted again for
+        RENEWAL_RETRY_INTERVAL seconds if it failed or if the new token
+        expires as soon, e.g. when authenticating with a token.
+
+        :returns: whether a new token was obtained
+        """
+        try:
+            self._reauthenticate(generation)
+        except (exceptions.ClientException,
+                requests.ConnectionError, requests.Timeout) as ex:
+            _logger.warning("Failed to renew the token about to expire: %s",
+                            ex)
+            self._renewal_not_before = time.time() + RENEWAL_RETRY_INTERVAL
+            return False
+        if self._token_expires_soon():
+            self._renewal_not_before = time.time() + RENEWAL_RETRY_INTERVAL
+        return self._auth_generation != generation
+
     def add_client(self, base_client_instance):
         """Add a new instance of :class:`BaseClient` descendant.
 
@@ -304,6 +510,7 @@ class HTTPClient(object):
 
     def authenticate(self):
         self.auth_plugin.authenticate(self)
+        self._auth_generation += 1
         # Store the authentication results in the keyring for later requests
         if self.keyring_saver:
             self.keyring_saver.save(self)
@@ -319,6 +526,8 @@ class BaseClient(object):
     service_type = None
     endpoint_type = None  # "publicURL" will be used
     cached_endpoint = None
+    # base.EntityCache used by the managers for get(), if any
+    entity_cache = None
 
     def __init__(self, http_client, extensions=None):
         self.http_client = http_client
@@ -0,0 +1,233 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Instrumentation of the requests sent by HTTPClient.
+
+Observers registered with `HTTPClient.add_observer()` are called before
+and after each request with a :class:`RequestRecord` describing it.
+"""
+
+import bisect
+import re
+import threading
+import time
+import urlparse
+
+
+# number of requests kept by HTTPClient when timings are enabled
+TIMINGS_SIZE = 1000
+
+# upper bounds, in seconds, of the latency buckets of RequestStats
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+_id_segment = re.compile(r'^(\d+|[0-9a-f]{32}|'
+                         r'[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12})$',
+                         re.IGNORECASE)
+
+
+def _replace_segments(path, template_ids):
+    segments = path.split('/')
+    for i, segment in enumerate(segments):
+        if i and segment and segments[i - 1] == 'tokens':
+            # the token ids, e.g. in /tokens/<id>/endpoints, are credentials
+            segments[i] = '{token}'
+        elif template_ids and _id_segment.match(segment):
+            segments[i] = '{id}'
+    return '/'.join(segments)
+
+
+def url_template(url):
+    """Return `url` without its query and with the ids in its path replaced.
+
+    E.g. "http://keystone/v3/users/8e8ec658c7b04243bdf86f7f2952c0d0" gives
+    "http://keystone/v3/users/{id}", so that the requests for the different
+    entities of a collection can be aggregated. Token ids, whatever their
+    format, are replaced by "{token}".
+    """
+    parts = urlparse.urlsplit(url)
+    path = _replace_segments(parts.path, template_ids=True)
+    return urlparse.urlunsplit((parts.scheme, parts.netloc, path, '', ''))
+
+
+def redact_url(url):
+    """Return `url` with the token ids in its path replaced by "{token}"."""
+    parts = urlparse.urlsplit(url)
+    path = _replace_segments(parts.path, template_ids=False)
+    return urlparse.urlunsplit(parts._replace(path=path))
+
+
+class RequestRecord(object):
+    """Description of a request sent by HTTPClient.
+
+    Known before the request is sent:
+
+    - `method`, `url` and `url_template`, the latter being safe to report
+      as it holds no token
+    - `request_bytes`: size of the body, 0 without body
+    - `start`: time the request was sent at, as returned by time.time()
+
+    Known once it is complete:
+
+    - `status_code`: None when no response was received
+    - `response_bytes`: size of the body, None when it is not read yet
+    - `ttfb`: seconds until the response headers were received
+    - `body_time`: seconds spent reading the response body afterwards
+    - `duration`: seconds spent in total
+    - `error`: exception raised while sending the request, if any
+
+    The time spent resolving the host and connecting is included in `ttfb`,
+    requests does not report it separately.
+
+    Observers may keep state for the request in the `context` dict.
+    """
+
+    def __init__(self, method, url, data=None):
+        self.method = method
+        self.url = url
+        self.url_template = url_template(url)
+        self.request_bytes = len(data) if data else 0
+        self.start = time.time()
+        self.end = None
+        self.status_code = None
+        self.response_bytes = None
+        self.ttfb = None
+        self.body_time = None
+        self.duration = None
+        self.error = None
+        self.context = {}
+
+    def finish(self, resp=None, error=None):
+        """Complete the record with the response or the error received."""
+        self.end = time.time()
+        self.duration = self.end - self.start
+        self.error = error
+        if resp is None:
+            return
+
+        self.status_code = resp.status_code
+        if getattr(resp, '_content_consumed', False):
+            self.response_bytes = len(resp.content or '')
+        else:
+            length = resp.headers.get('content-length')
+            if length and length.isdigit():
+                self.response_bytes = int(length)
+        elapsed = getattr(resp, 'elapsed', None)
+        if elapsed:
+            self.ttfb = min(elapsed.total_seconds(), self.duration)
+            self.body_time = self.duration - self.ttfb
+
+
+class RequestObserver(object):
+    """Base class for the observers of the requests sent by HTTPClient.
+
+    Observers are called from the threads sending the requests and must be
+    thread-safe.
+    """
+
+    def before_request(self, record):
+        """Called before sending the request described by `record`."""
+
+    def after_request(self, record):
+        """Called once the request described by `record` is complete.
+
+        This is also the case when it failed, before the error is raised.
+        """
+
+
+class RequestStats(RequestObserver):
+    """Aggregate the requests by method and URL template.
+
+    Memory use is bounded by the number of distinct URL templates: each
+    one keeps counters and a histogram of the durations in
+    `LATENCY_BUCKETS`, not the individual requests.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def after_request(self, record):
+        key = (record.method, record.url_template)
+        bucket = bisect.bisect_left(self.buckets, record.duration)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    'count': 0,
+                    'errors': 0,
+                    'duration': 0.0,
+                    'response_bytes': 0,
+                    'histogram': [0] * (len(self.buckets) + 1),
+                }
+            stats['count'] += 1
+            if record.error is not None or (record.status_code or 0) >= 400:
+                stats['errors'] += 1
+            stats['duration'] += record.duration
+            stats['response_bytes'] += record.response_bytes or 0
+            stats['histogram'][bucket] += 1
+
+    def get_stats(self):
+        """Return the statistics gathered so far.
+
+        :returns: dict keyed by (method, url template) of dicts holding the
+            number of requests ('count') and of failed ones ('errors'), the
+            total 'duration' and 'response_bytes', and the 'histogram' of
+            the durations, whose last bucket counts those beyond the last
+            bound
+        """
+        with self._lock:
+            return dict((key, dict(stats, histogram=list(stats['histogram'])))
+                        for key, stats in self._stats.items())
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class TracingObserver(RequestObserver):
+    """Report each request as a span of an OpenTelemetry-style tracer.
+
+    :param tracer: object whose start_span(name, attributes=None) method
+        returns spans providing set_attribute(key, value) and end(), as the
+        tracers of the OpenTelemetry API do
+    """
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def before_request(self, record):
+        record.context[self] = self.tracer.start_span(
+            'HTTP %s' % record.method,
+            attributes={'http.method': record.method,
+                        'http.url': redact_url(record.url),
+                        'http.route': record.url_template})
+
+    def after_request(self, record):
+        span = record.context.pop(self, None)
+        if span is None:
+            return
+        if record.status_code is not None:
+            span.set_attribute('http.status_code', record.status_code)
+        if record.response_bytes is not None:
+            span.set_attribute('http.response_content_length',
+                               record.response_bytes)
+        if record.error is not None:
+            span.set_attribute('error', True)
+            record_exception = getattr(span, 'record_exception', None)
+            if record_exception is not None:
+                record_exception(record.error)
+        span.end()
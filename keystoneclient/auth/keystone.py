@@ -34,9 +34,16 @@ class KeystoneBaseAuthPlugin(auth.BaseAuthPlugin):
     def token_and_endpoint(self, endpoint_type, service_type):
         if not self.access_info:
             return (None, None)
+        catalog = self.access_info.service_catalog
+        if self.endpoint_selector is not None:
+            urls = catalog.get_urls(endpoint_type=endpoint_type,
+                                    service_type=service_type)
+            if urls:
+                return (self.access_info.auth_token,
+                        self.endpoint_selector.select(urls))
         return (self.access_info.auth_token,
-                self.access_info.service_catalog.url_for(
-                    endpoint_type=endpoint_type, service_type=service_type))
+                catalog.url_for(endpoint_type=endpoint_type,
+                                service_type=service_type))
 
     def _do_authenticate(self, http_client):
         resp = self._get_auth_response(http_client)
@@ -1,3 +1,4 @@
+import base64
 import hashlib
 
 import logging
@@ -6,6 +7,9 @@ import logging
 subprocess = None
 LOG = logging.getLogger(__name__)
 PKI_ANS1_PREFIX = 'MII'
+PEM_CMS_BEGIN = '-----BEGIN CMS-----'
+PEM_CMS_END = '-----END CMS-----'
+PEM_LINE_LENGTH = 64
 
 
 def _ensure_subprocess():
@@ -24,16 +28,18 @@ def _ensure_subprocess():
             import subprocess  # noqa
 
 
-def cms_verify(formatted, signing_cert_file_name, ca_file_name):
+def cms_verify(formatted, signing_cert_file_name, ca_file_name,
+               inform='PEM'):
     """Verifies the signature of the contents IAW CMS syntax.
 
+    :param inform: format of formatted, either 'PEM' or 'DER'
     :raises: subprocess.CalledProcessError
     """
     _ensure_subprocess()
     process = subprocess.Popen(["openssl", "cms", "-verify",
                                 "-certfile", signing_cert_file_name,
                                 "-CAfile", ca_file_name,
-                                "-inform", "PEM",
+                                "-inform", inform,
                                 "-nosmimecap", "-nodetach",
                                 "-nocerts", "-noattr"],
                                stdin=subprocess.PIPE,
@@ -55,26 +61,28 @@ def cms_verify(formatted, signing_cert_file_name, ca_file_name):
 def token_to_cms(signed_text):
     copy_of_text = signed_text.replace('-', '/')
 
-    formatted = "-----BEGIN CMS-----\n"
-    line_length = 64
-    while len(copy_of_text) > 0:
-        if (len(copy_of_text) > line_length):
-            formatted += copy_of_text[:line_length]
-            copy_of_text = copy_of_text[line_length:]
-        else:
-            formatted += copy_of_text
-            copy_of_text = ""
-        formatted += "\n"
+    lines = [PEM_CMS_BEGIN]
+    lines.extend(copy_of_text[i:i + PEM_LINE_LENGTH]
+                 for i in range(0, len(copy_of_text), PEM_LINE_LENGTH))
+    lines.append(PEM_CMS_END)
+    lines.append('')
 
-    formatted += "-----END CMS-----\n"
+    return '\n'.join(lines)
 
-    return formatted
+
+def token_to_der(signed_text):
+    """Decode a PKI token to the DER encoded CMS document it carries.
+
+    This skips building the PEM framing that token_to_cms produces.
+    """
+    return base64.b64decode(signed_text.replace('-', '/'))
 
 
 def verify_token(token, signing_cert_file_name, ca_file_name):
-    return cms_verify(token_to_cms(token),
+    return cms_verify(token_to_der(token),
                       signing_cert_file_name,
-                      ca_file_name)
+                      ca_file_name,
+                      inform='DER')
 
 
 def is_ans1_token(token):
@@ -151,27 +159,27 @@ def cms_sign_token(text, signing_cert_file_name, signing_key_file_name):
 
 def cms_to_token(cms_text):
 
-    start_delim = "-----BEGIN CMS-----"
-    end_delim = "-----END CMS-----"
-    signed_text = cms_text
-    signed_text = signed_text.replace('/', '-')
-    signed_text = signed_text.replace(start_delim, '')
-    signed_text = signed_text.replace(end_delim, '')
-    signed_text = signed_text.replace('\n', '')
+    start = cms_text.find(PEM_CMS_BEGIN)
+    start = 0 if start == -1 else start + len(PEM_CMS_BEGIN)
+    end = cms_text.find(PEM_CMS_END, start)
+    if end == -1:
+        end = len(cms_text)
+    signed_text = ''.join(cms_text[start:end].split('\n'))
 
-    return signed_text
+    return signed_text.replace('/', '-')
 
 
-def cms_hash_token(token_id):
+def cms_hash_token(token_id, mode='md5'):
     """Hash PKI tokens.
 
+    :param mode: name of the hashlib algorithm used to hash the token
     return: for ans1_token, returns the hash of the passed in token
             otherwise, returns what it was passed in.
     """
     if token_id is None:
         return None
     if is_ans1_token(token_id):
-        hasher = hashlib.md5()
+        hasher = hashlib.new(mode)
         hasher.update(token_id)
         return hasher.hexdigest()
     else:
@@ -15,15 +15,29 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
 import logging
+import time
 import urlparse
 
+from keystoneclient.apiclient import base
 from keystoneclient.apiclient import exceptions
 from keystoneclient import httpclient
+from keystoneclient.openstack.common import memorycache
 
 
 _logger = logging.getLogger(__name__)
 
+# seconds the results of discover() and discover_extensions() are cached for
+DISCOVERY_CACHE_TTL = 300
+
+# cache used by the clients created without discovery_cache, shared by all
+# of them in the process
+_discovery_cache = memorycache.Client()
+
+# seconds each endpoint is given to answer by probe_endpoints()
+PROBE_TIMEOUT = 5
+
 
 class Client(httpclient.HTTPClient):
     """Client for the OpenStack Keystone pre-version calls API.
@@ -32,6 +46,13 @@ class Client(httpclient.HTTPClient):
                             service.
     :param integer timeout: Allows customization of the timeout for client
                             http requests. (optional)
+    :param discovery_cache: Cache the results of the discovery are kept in,
+                            e.g. a memcache.Client shared by several
+                            processes. Defaults to a cache shared by the
+                            clients of the process. (optional)
+    :param integer discovery_cache_ttl: Seconds the results of the discovery
+                                        are cached for, 0 disables the
+                                        cache. (optional)
 
     Example::
 
@@ -48,8 +69,31 @@ class Client(httpclient.HTTPClient):
     """
     def __init__(self, endpoint=None, **kwargs):
         """Initialize a new client for the Keystone v2.0 API."""
+        discovery_cache = kwargs.pop('discovery_cache', None)
+        self.discovery_cache_ttl = kwargs.pop('discovery_cache_ttl',
+                                              DISCOVERY_CACHE_TTL)
         super(Client, self).__init__(endpoint=endpoint, **kwargs)
         self.endpoint = endpoint
+        if discovery_cache is None:
+            discovery_cache = _discovery_cache
+        self.discovery_cache = discovery_cache
+
+    def _cached_discovery(self, kind, url, discover):
+        """Return the result of `discover(url)`, cached by kind and URL.
+
+        Failed discoveries, which give None, are not cached.
+        """
+        if not self.discovery_cache_ttl:
+            return discover(url)
+
+        key = 'keystoneclient.discovery.%s:%s' % (kind, url)
+        results = self.discovery_cache.get(key)
+        if results is None:
+            results = discover(url)
+            if results is not None:
+                self.discovery_cache.set(key, results,
+                                         time=self.discovery_cache_ttl)
+        return copy.deepcopy(results)
 
     def discover(self, url=None):
         """Discover Keystone servers and return API versions supported.
@@ -69,56 +113,116 @@ class Client(httpclient.HTTPClient):
 
         """
         if url:
-            return self._check_keystone_versions(url)
+            return self._cached_discovery('versions', url,
+                                          self._check_keystone_versions)
         else:
             return self._local_keystone_exists()
 
     def _local_keystone_exists(self):
         """Checks if Keystone is available on default local port 35357."""
-        return self._check_keystone_versions("http://localhost:35357")
+        return self._cached_discovery('versions', "http://localhost:35357",
+                                      self._check_keystone_versions)
+
+    def probe_endpoints(self, urls, timeout=PROBE_TIMEOUT,
+                        max_workers=base.CONCURRENCY):
+        """Probe several Keystone servers concurrently.
+
+        Each URL is sent the request of discover(), which is given `timeout`
+        seconds to complete. The results are not cached.
+
+        :param urls: URLs of the candidate servers (without version)
+        :returns: list of dicts, one per URL, holding the 'url', whether it
+            is 'healthy', i.e. it lists at least one API version, the
+            'latency' of the request in seconds, the 'versions' as returned
+            by discover() and the 'error' raised by the request, if any;
+            the healthy servers come first, fastest first, followed by the
+            others in the order of `urls`
+        """
+        def probe(url):
+            start = time.time()
+            versions = error = None
+            try:
+                versions = self._get_keystone_versions(url, timeout=timeout)
+            except Exception as e:
+                _logger.warning('Keystone at %s is unavailable: %s', url, e)
+                error = e
+            return {
+                'url': url,
+                'healthy': any(key != 'message' for key in versions or ()),
+                'latency': time.time() - start,
+                'versions': versions,
+                'error': error,
+            }
+
+        probes = base.map_concurrently(probe, urls, max_workers=max_workers)
+        return sorted(probes,
+                      key=lambda p: (not p['healthy'],
+                                     p['latency'] if p['healthy'] else 0))
+
+    def select_endpoint(self, urls, timeout=PROBE_TIMEOUT,
+                        max_workers=base.CONCURRENCY):
+        """Return the URL of the fastest healthy server of `urls`.
+
+        See probe_endpoints() for the parameters.
+
+        :raises: EndpointNotFound if none of them is healthy
+        """
+        fastest = self.probe_endpoints(urls, timeout=timeout,
+                                       max_workers=max_workers)
+        if not fastest or not fastest[0]['healthy']:
+            raise exceptions.EndpointNotFound(
+                "No healthy Keystone found at %s" % ', '.join(urls))
+        return fastest[0]['url']
 
     def _check_keystone_versions(self, url):
         """Calls Keystone URL and detects the available API versions."""
         try:
-            resp = self.http_client.request(
-                "GET", url, headers={'Accept': 'application/json'})
-            # Multiple Choices status code is returned by the root
-            # identity endpoint, with references to one or more
-            # Identity API versions -- v3 spec
-            # some cases we get No Content
-            body = resp.json()
-            if not body:
-                return None
-            try:
-                results = {}
-                if 'version' in body:
-                    results['message'] = "Keystone found at %s" % url
-                    version = body['version']
-                    # Stable/diablo incorrect format
+            return self._get_keystone_versions(url)
+        except Exception as e:
+            _logger.exception(e)
+
+    def _get_keystone_versions(self, url, **kwargs):
+        """Like _check_keystone_versions, but raises the errors.
+
+        :param kwargs: passed to the request, e.g. its timeout
+        """
+        resp = self.http_client.request(
+            "GET", url, headers={'Accept': 'application/json'}, **kwargs)
+        # Multiple Choices status code is returned by the root
+        # identity endpoint, with references to one or more
+        # Identity API versions -- v3 spec
+        # some cases we get No Content
+        body = resp.json()
+        if not body:
+            return None
+        try:
+            results = {}
+            if 'version' in body:
+                results['message'] = "Keystone found at %s" % url
+                version = body['version']
+                # Stable/diablo incorrect format
+                id, status, version_url = \
+                    self._get_version_info(version, url)
+                results[str(id)] = {"id": id,
+                                    "status": status,
+                                    "url": version_url}
+                return results
+            elif 'versions' in body:
+                # Correct format
+                results['message'] = "Keystone found at %s" % url
+                for version in body['versions']['values']:
                     id, status, version_url = \
                         self._get_version_info(version, url)
                     results[str(id)] = {"id": id,
                                         "status": status,
                                         "url": version_url}
-                    return results
-                elif 'versions' in body:
-                    # Correct format
-                    results['message'] = "Keystone found at %s" % url
-                    for version in body['versions']['values']:
-                        id, status, version_url = \
-                            self._get_version_info(version, url)
-                        results[str(id)] = {"id": id,
-                                            "status": status,
-                                            "url": version_url}
-                    return results
-                else:
-                    results['message'] = ("Unrecognized response from %s"
-                                          % url)
                 return results
-            except KeyError:
-                raise exceptions.AuthorizationFailure()
-        except Exception as e:
-            _logger.exception(e)
+            else:
+                results['message'] = ("Unrecognized response from %s"
+                                      % url)
+            return results
+        except KeyError:
+            raise exceptions.AuthorizationFailure()
 
     def discover_extensions(self, url=None):
         """Discover Keystone extensions supported.
@@ -134,7 +238,8 @@ class Client(httpclient.HTTPClient):
 
         """
         if url:
-            return self._check_keystone_extensions(url)
+            return self._cached_discovery('extensions', url,
+                                          self._check_keystone_extensions)
 
     def _check_keystone_extensions(self, url):
         """Calls Keystone URL and detects the available extensions."""
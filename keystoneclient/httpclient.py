@@ -11,13 +11,6 @@ OpenStack Client interface. Handles the REST calls and responses.
 import logging
 import urlparse
 
-try:
-    import keyring
-    import pickle
-except ImportError:
-    keyring = None
-    pickle = None
-
 try:
     import json
 except ImportError:
@@ -30,9 +23,12 @@ if not hasattr(urlparse, 'parse_qsl'):
 
 
 from keystoneclient import access
+from keystoneclient.apiclient import balancing
+from keystoneclient.apiclient import base
 from keystoneclient.apiclient import client
 from keystoneclient.auth import endpoint as auth_endpoint
 from keystoneclient.auth import keystone as auth_keystone
+from keystoneclient import token_cache
 
 
 _logger = logging.getLogger(__name__)
@@ -86,7 +82,11 @@ class HTTPClient(client.BaseClient):
                  project_id=None, project_name=None, project_domain_id=None,
                  project_domain_name=None,
                  version=None,
-                 http_client=None):
+                 http_client=None, entity_cache_ttl=None,
+                 entity_cache_size=None, pool_connections=None,
+                 pool_maxsize=None, pool_block=False, pool_idle_timeout=None,
+                 share_session=False, endpoint_selection=None,
+                 endpoint_cooldown=None, token_cache_dir=None):
         """Construct a new http client
 
         :param string user_id: User ID for authentication. (optional)
@@ -144,6 +144,10 @@ class HTTPClient(client.BaseClient):
                               argument will take precedence.
         :param boolean use_keyring: Enables caching auth_ref into keyring.
                                     default: False (optional)
+        :param string token_cache_dir: Enables caching auth_ref into files
+                                       of this directory instead of the
+                                       keyring, which is much faster to
+                                       read. (optional)
         :param boolean force_new_token: Keyring related parameter, forces
                                        request for new token.
                                        default: False (optional)
@@ -156,6 +160,38 @@ class HTTPClient(client.BaseClient):
         :param string tenant_id: Tenant id. (optional)
                                  The tenant_id keyword argument is
                                  deprecated, use project_id instead.
+        :param integer entity_cache_ttl: Enables caching the entities read by
+                                         the managers' get() for the given
+                                         number of seconds. Writes made
+                                         through the managers invalidate the
+                                         affected entities. (optional)
+        :param integer entity_cache_size: Maximum number of cached entities.
+                                          default: 1000 (optional)
+        :param integer pool_connections: Number of hosts for which connection
+                                         pools are kept. default: 10
+                                         (optional)
+        :param integer pool_maxsize: Maximum number of connections kept per
+                                     host. default: 10 (optional)
+        :param boolean pool_block: Makes requests wait for a connection to be
+                                   available rather than opening connections
+                                   beyond pool_maxsize which are not kept.
+                                   default: False (optional)
+        :param integer pool_idle_timeout: Seconds after which kept-alive
+                                          connections left unused are not
+                                          reused anymore. (optional)
+        :param boolean share_session: Makes all the clients of the process for
+                                      the same endpoint and connection pool
+                                      options share their connections.
+                                      default: False (optional)
+        :param string endpoint_selection: Spreads the requests across all the
+                                          endpoints of the service catalog
+                                          matching them, either in turn
+                                          ('round-robin') or favouring the
+                                          fastest ('least-latency').
+                                          (optional)
+        :param integer endpoint_cooldown: Seconds an endpoint is left out of
+                                          the selection after a connection
+                                          error. default: 30 (optional)
 
         """
         self.version = version
@@ -197,6 +233,11 @@ class HTTPClient(client.BaseClient):
             )
         if endpoint:
             auth_plugin.opts["endpoint"] = endpoint
+        if endpoint_selection:
+            auth_plugin.endpoint_selector = balancing.EndpointSelector(
+                strategy=endpoint_selection,
+                cooldown=(balancing.EJECTION_COOLDOWN
+                          if endpoint_cooldown is None else endpoint_cooldown))
         if auth_ref:
             auth_plugin.access_info = access.AccessInfo.factory(
                 **auth_ref)
@@ -212,6 +253,14 @@ class HTTPClient(client.BaseClient):
                 cert = (cert, key,)
             else:
                 cert = cert or None
+            pool_options = dict(pool_connections=pool_connections,
+                                pool_maxsize=pool_maxsize,
+                                pool_block=pool_block,
+                                pool_idle_timeout=pool_idle_timeout)
+            http = None
+            if share_session:
+                http = client.get_shared_session(endpoint or auth_url,
+                                                 **pool_options)
             http_client = client.HTTPClient(
                 auth_plugin=auth_plugin,
                 timeout=float(timeout) if timeout is not None else None,
@@ -219,14 +268,28 @@ class HTTPClient(client.BaseClient):
                 original_ip=original_ip,
                 verify=verify,
                 cert=cert,
-                debug=debug)
+                debug=debug,
+                stale_duration=stale_duration,
+                http=http,
+                **pool_options)
             http_client.user_agent = "python-keystoneclient"
         super(HTTPClient, self).__init__(http_client=http_client)
 
+        if entity_cache_ttl:
+            self.entity_cache = base.EntityCache(
+                ttl=entity_cache_ttl,
+                max_size=entity_cache_size or base.ENTITY_CACHE_SIZE)
+
         # keyring setup
-        if use_keyring and keyring is None:
-            _logger.warning('Failed to load keyring modules.')
-        self.use_keyring = use_keyring and keyring is not None
+        self.token_cache = None
+        if token_cache_dir:
+            self.token_cache = token_cache.FileTokenCache(token_cache_dir)
+        elif use_keyring:
+            try:
+                self.token_cache = token_cache.KeyringTokenCache()
+            except ImportError:
+                _logger.warning('Failed to load keyring modules.')
+        self.use_keyring = self.token_cache is not None
 
         self.force_new_token = force_new_token
         self.stale_duration = stale_duration or access.STALE_TOKEN_DURATION
@@ -528,10 +591,9 @@ class HTTPClient(client.BaseClient):
         if self.use_keyring:
             keyring_key = self._build_keyring_key(**kwargs)
             try:
-                auth_ref = keyring.get_password("keystoneclient_auth",
-                                                keyring_key)
+                auth_ref = self.token_cache.get(keyring_key)
                 if auth_ref:
-                    auth_ref = pickle.loads(auth_ref)
+                    auth_ref = token_cache.deserialize(auth_ref)
                     if auth_ref.will_expire_soon(self.stale_duration):
                         # token has expired, don't use it
                         auth_ref = None
@@ -547,9 +609,8 @@ class HTTPClient(client.BaseClient):
         """
         if self.use_keyring:
             try:
-                keyring.set_password("keystoneclient_auth",
-                                     keyring_key,
-                                     pickle.dumps(self.auth_ref))
+                self.token_cache.set(keyring_key,
+                                     token_cache.serialize(self.auth_ref))
             except Exception as e:
                 _logger.warning("Failed to store token into keyring %s" % (e))
 
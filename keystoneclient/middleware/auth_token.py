@@ -144,7 +144,9 @@ keystone.token_info
 
 """
 
+import abc
 import datetime
+import hashlib
 import httplib
 import json
 import logging
@@ -158,6 +160,7 @@ import six
 
 from keystoneclient.common import cms
 from keystoneclient.middleware import memcache_crypt
+from keystoneclient.openstack.common import importutils
 from keystoneclient.openstack.common import jsonutils
 from keystoneclient.openstack.common import memorycache
 from keystoneclient.openstack.common import timeutils
@@ -270,6 +273,19 @@ opts = [
     cfg.IntOpt('revocation_cache_time',
                default=1,
                help='Value only used for unit testing'),
+    cfg.BoolOpt('adaptive_token_cache_time',
+                default=False,
+                help='Cache PKI tokens until they expire, instead of for'
+                ' token_cache_time, when they are validated against a'
+                ' current revocation list. Cached PKI tokens are then checked'
+                ' against the revocation list on every request, so revoked'
+                ' tokens are still rejected.'),
+    cfg.IntOpt('discovery_cache_time',
+               default=300,
+               help='Number of seconds the API versions supported by the'
+               ' Keystone server are cached for, in the same cache as the'
+               ' tokens, so that the workers of a service do not each query'
+               ' them. Set to 0 to disable caching them.'),
     cfg.StrOpt('memcache_security_strategy',
                default=None,
                help='(optional) if defined, indicate whether token data'
@@ -283,12 +299,43 @@ opts = [
                default=None,
                secret=True,
                help='(optional, mandatory if memcache_security_strategy is'
-               ' defined) this string is used for key derivation.')
+               ' defined) this string is used for key derivation.'),
+    cfg.StrOpt('hash_algorithm',
+               default='md5',
+               help='Hash algorithm used to identify PKI tokens. The digest'
+               ' is computed once per request and serves as the cache key'
+               ' and as the identifier checked against the revocation list,'
+               ' so it must match the algorithm Keystone uses to hash'
+               ' revoked tokens.'),
+    cfg.ListOpt('token_validation_backends',
+                default=['pki', 'uuid'],
+                help='Ordered list of backends used to validate user tokens.'
+                ' Each entry is either the name of a builtin backend (pki,'
+                ' uuid) or the import path of a TokenValidationBackend'
+                ' subclass. The first backend that handles a token'
+                ' validates it.'),
+    cfg.ListOpt('service_catalog_types',
+                default=None,
+                help='If defined, only the services of these types are'
+                ' kept in the service catalog passed to the application'
+                ' (X-Service-Catalog and keystone.token_info).'),
+    cfg.ListOpt('service_catalog_interfaces',
+                default=None,
+                help='If defined, only the endpoints of these interfaces'
+                ' (public, internal, admin) are kept in the service catalog'
+                ' passed to the application.'),
+    cfg.ListOpt('service_catalog_regions',
+                default=None,
+                help='If defined, only the endpoints of these regions are'
+                ' kept in the service catalog passed to the application.'),
 ]
 CONF.register_opts(opts, group='keystone_authtoken')
 
 LIST_OF_VERSIONS_TO_ATTEMPT = ['v2.0', 'v3.0']
 CACHE_KEY_TEMPLATE = 'tokens/%s'
+VERSIONS_CACHE_KEY_TEMPLATE = 'versions/%s'
+# memcached treats expiration times above 30 days as absolute timestamps
+MAX_CACHE_TIME = 60 * 60 * 24 * 30
 
 
 def will_expire_soon(expiry):
@@ -322,6 +369,63 @@ class NetworkError(Exception):
     pass
 
 
+class TokenValidationBackend(object):
+    """Base class for token validation backends.
+
+    A backend is bound to the AuthProtocol instance it serves, which gives
+    it access to the middleware configuration, admin token and certificates.
+    Caching of validated tokens stays in the middleware, so a backend is
+    only consulted on a cache miss.
+
+    """
+
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, middleware):
+        self.middleware = middleware
+
+    def handles(self, user_token):
+        """Indicate whether this backend is able to validate the token."""
+        return True
+
+    @abc.abstractmethod
+    def validate(self, user_token, token_id, retry=True):
+        """Validate a user token.
+
+        :param user_token: user's token id
+        :param token_id: the digest of user_token used as the cache key
+        :param retry: flag that allows the backend to retry validation
+                      when an indeterminate response is received
+        :return token object as returned by keystone
+        :raise InvalidUserToken if token is rejected
+
+        """
+
+
+class PKITokenBackend(TokenValidationBackend):
+    """Validates PKI tokens locally by checking their CMS signature."""
+
+    def handles(self, user_token):
+        return cms.is_ans1_token(user_token)
+
+    def validate(self, user_token, token_id, retry=True):
+        verified = self.middleware.verify_signed_token(user_token, token_id)
+        return json.loads(verified)
+
+
+class UUIDTokenBackend(TokenValidationBackend):
+    """Validates tokens online against the keystone token API."""
+
+    def validate(self, user_token, token_id, retry=True):
+        return self.middleware.verify_uuid_token(user_token, retry)
+
+
+TOKEN_VALIDATION_BACKENDS = {
+    'pki': PKITokenBackend,
+    'uuid': UUIDTokenBackend,
+}
+
+
 class MiniResp(object):
     def __init__(self, error_message, env, headers=[]):
         # The HEAD method is unique: it must never return a body, even if
@@ -420,6 +524,12 @@ class AuthProtocol(object):
         self._assert_valid_memcache_protection_config()
         # By default the token will be cached for 5 minutes
         self.token_cache_time = int(self._conf_get('token_cache_time'))
+        self.adaptive_token_cache_time = (
+            self._conf_get('adaptive_token_cache_time') in
+            (True, 'true', 't', '1', 'on', 'yes', 'y'))
+        self.discovery_cache_time = int(self._conf_get('discovery_cache_time'))
+        self.hash_algorithm = self._conf_get('hash_algorithm')
+        self._assert_valid_hash_algorithm()
         self._token_revocation_list = None
         self._token_revocation_list_fetched_time = None
         self.token_revocation_list_cache_timeout = datetime.timedelta(
@@ -429,6 +539,21 @@ class AuthProtocol(object):
                                      int(http_connect_timeout_cfg))
         self.auth_version = None
         self.http_request_max_retries = 3
+        self.token_validation_backends = self._load_validation_backends()
+
+        # projection of the service catalog handed to the application,
+        # applied once when a token is validated
+        self.service_catalog_types = self._conf_get_set(
+            'service_catalog_types')
+        self.service_catalog_interfaces = self._conf_get_set(
+            'service_catalog_interfaces')
+        if self.service_catalog_interfaces:
+            # accept both the v2 (publicURL) and v3 (public) forms
+            self.service_catalog_interfaces = set(
+                interface[:-3] if interface.endswith('URL') else interface
+                for interface in self.service_catalog_interfaces)
+        self.service_catalog_regions = self._conf_get_set(
+            'service_catalog_regions')
 
     def _assert_valid_memcache_protection_config(self):
         if self._memcache_security_strategy:
@@ -439,6 +564,47 @@ class AuthProtocol(object):
                 raise Exception('mecmache_secret_key must be defined when '
                                 'a memcache_security_strategy is defined')
 
+    def _assert_valid_hash_algorithm(self):
+        try:
+            hashlib.new(self.hash_algorithm)
+        except ValueError:
+            raise ConfigurationError('hash_algorithm %s is not supported' %
+                                     self.hash_algorithm)
+
+    def _conf_get_list(self, name):
+        # list options given in the paste config are plain strings
+        value = self._conf_get(name)
+        if isinstance(value, six.string_types):
+            value = [v.strip() for v in value.split(',') if v.strip()]
+        return value
+
+    def _conf_get_set(self, name):
+        value = self._conf_get_list(name)
+        return set(value) if value else None
+
+    def _load_validation_backends(self):
+        backends = self._conf_get_list('token_validation_backends')
+
+        loaded = []
+        for backend in backends:
+            if isinstance(backend, six.string_types):
+                try:
+                    backend_class = TOKEN_VALIDATION_BACKENDS[backend]
+                except KeyError:
+                    try:
+                        backend_class = importutils.import_class(backend)
+                    except ImportError:
+                        raise ConfigurationError(
+                            'unable to load token validation backend %s' %
+                            backend)
+            else:
+                backend_class = backend
+            loaded.append(backend_class(self))
+
+        if not loaded:
+            raise ConfigurationError('no token validation backend configured')
+        return loaded
+
     def _init_cache(self, env):
         cache = self._conf_get('cache')
         memcache_servers = self._conf_get('memcached_servers')
@@ -493,6 +659,33 @@ class AuthProtocol(object):
         return version_to_use
 
     def _get_supported_versions(self):
+        """Return the API versions supported by the server.
+
+        They are kept in the cache for discovery_cache_time, keyed by the
+        URL of the server, and protected like the tokens when
+        memcache_security_strategy is set.
+        """
+        use_cache = self._cache and self.discovery_cache_time > 0
+        if use_cache:
+            server_url = '%s://%s:%s%s' % (
+                self.auth_protocol, self.auth_host, self.auth_port,
+                self.auth_admin_prefix)
+            serialized = self._cache_get_serialized(
+                VERSIONS_CACHE_KEY_TEMPLATE, server_url)
+            if serialized is not None:
+                versions = json.loads(serialized)
+                self.LOG.debug('Using cached api versions: %s',
+                               ', '.join(versions))
+                return versions
+
+        versions = self._fetch_supported_versions()
+        if use_cache:
+            self._cache_store_serialized(VERSIONS_CACHE_KEY_TEMPLATE,
+                                         server_url, json.dumps(versions),
+                                         self.discovery_cache_time)
+        return versions
+
+    def _fetch_supported_versions(self):
         versions = []
         response, data = self._json_request('GET', '/')
         if response.status == 501:
@@ -769,18 +962,20 @@ class AuthProtocol(object):
         :no longer raises ServiceError since it no longer makes RPC
 
         """
+        token_id = cms.cms_hash_token(user_token, mode=self.hash_algorithm)
         try:
-            token_id = cms.cms_hash_token(user_token)
+            signed = cms.is_ans1_token(user_token)
             cached = self._cache_get(token_id)
             if cached:
+                if (signed and self.adaptive_token_cache_time and
+                        self.is_signed_token_revoked(user_token, token_id)):
+                    raise InvalidUserToken('Token has been revoked')
                 return cached
-            if cms.is_ans1_token(user_token):
-                verified = self.verify_signed_token(user_token)
-                data = json.loads(verified)
-            else:
-                data = self.verify_uuid_token(user_token, retry)
+            backend = self._get_validation_backend(user_token)
+            data = backend.validate(user_token, token_id, retry)
             expires = self._confirm_token_not_expired(data)
-            self._cache_put(token_id, data, expires)
+            data = self._project_service_catalog(data)
+            self._cache_put(token_id, data, expires, signed)
             return data
         except NetworkError as e:
             self.LOG.debug('Token validation failure.', exc_info=True)
@@ -788,10 +983,89 @@ class AuthProtocol(object):
             raise InvalidUserToken('Token authorization failed')
         except Exception as e:
             self.LOG.debug('Token validation failure.', exc_info=True)
-            self._cache_store_invalid(user_token)
+            self._cache_store_invalid(token_id)
             self.LOG.warn("Authorization failed for token %s", user_token)
             raise InvalidUserToken('Token authorization failed')
 
+    def _project_service_catalog(self, token_info):
+        """Restrict the service catalog of a token to what is configured.
+
+        The projected catalog is what gets cached, so X-Service-Catalog
+        only carries the relevant services on each request.
+
+        :param token_info: token object returned by keystone on validation
+        :return token object with the projected catalog, the given token
+                object is left untouched
+
+        """
+        if not (self.service_catalog_types or
+                self.service_catalog_interfaces or
+                self.service_catalog_regions):
+            return token_info
+
+        if self._token_is_v2(token_info):
+            root_key, catalog_key = 'access', 'serviceCatalog'
+            filter_endpoint = self._filter_v2_endpoint
+        elif self._token_is_v3(token_info):
+            root_key, catalog_key = 'token', 'catalog'
+            filter_endpoint = self._filter_v3_endpoint
+        else:
+            return token_info
+
+        catalog = token_info[root_key].get(catalog_key)
+        if not catalog:
+            return token_info
+
+        projected = []
+        for service in catalog:
+            if (self.service_catalog_types and
+                    service.get('type') not in self.service_catalog_types):
+                continue
+            endpoints = []
+            for endpoint in service.get('endpoints', []):
+                if (self.service_catalog_regions and
+                        endpoint.get('region') not in
+                        self.service_catalog_regions):
+                    continue
+                endpoint = filter_endpoint(endpoint)
+                if endpoint:
+                    endpoints.append(endpoint)
+            if endpoints:
+                projected.append(dict(service, endpoints=endpoints))
+
+        root = dict(token_info[root_key])
+        root[catalog_key] = projected
+        return dict(token_info, **{root_key: root})
+
+    def _filter_v2_endpoint(self, endpoint):
+        if not self.service_catalog_interfaces:
+            return endpoint
+        # v2 endpoints carry one url per interface, e.g. publicURL
+        endpoint = dict((key, value) for key, value in six.iteritems(endpoint)
+                        if not key.endswith('URL') or
+                        key[:-3] in self.service_catalog_interfaces)
+        if not any(key.endswith('URL') for key in endpoint):
+            return None
+        return endpoint
+
+    def _filter_v3_endpoint(self, endpoint):
+        if (self.service_catalog_interfaces and
+                endpoint.get('interface') not in
+                self.service_catalog_interfaces):
+            return None
+        return endpoint
+
+    def _get_validation_backend(self, user_token):
+        """Return the first configured backend that handles the token.
+
+        :raise InvalidUserToken if no backend is able to validate the token
+
+        """
+        for backend in self.token_validation_backends:
+            if backend.handles(user_token):
+                return backend
+        raise InvalidUserToken('No backend is able to validate the token')
+
     def _token_is_v2(self, token_info):
         return ('access' in token_info)
 
@@ -938,28 +1212,7 @@ class AuthProtocol(object):
         """
 
         if self._cache and token:
-            if self._memcache_security_strategy is None:
-                key = CACHE_KEY_TEMPLATE % token
-                serialized = self._cache.get(key)
-            else:
-                keys = memcache_crypt.derive_keys(
-                    token,
-                    self._memcache_secret_key,
-                    self._memcache_security_strategy)
-                cache_key = CACHE_KEY_TEMPLATE % (
-                    memcache_crypt.get_cache_key(keys))
-                raw_cached = self._cache.get(cache_key)
-                try:
-                    # unprotect_data will return None if raw_cached is None
-                    serialized = memcache_crypt.unprotect_data(keys,
-                                                               raw_cached)
-                except Exception:
-                    msg = 'Failed to decrypt/verify cache data'
-                    self.LOG.exception(msg)
-                    # this should have the same effect as data not
-                    # found in cache
-                    serialized = None
-
+            serialized = self._cache_get_serialized(CACHE_KEY_TEMPLATE, token)
             if serialized is None:
                 return None
 
@@ -978,24 +1231,62 @@ class AuthProtocol(object):
             else:
                 self.LOG.debug('Cached Token %s seems expired', token)
 
-    def _cache_store(self, token, data):
+    def _cache_store(self, token, data, cache_time=None):
         """Store value into memcache.
 
         data may be the string 'invalid' or a tuple like (data, expires)
 
+        :param cache_time: seconds to keep the value in the cache, defaults
+                           to token_cache_time
+
+        """
+        if cache_time is None:
+            cache_time = self.token_cache_time
+        self._cache_store_serialized(CACHE_KEY_TEMPLATE, token,
+                                     json.dumps(data), cache_time)
+
+    def _cache_get_serialized(self, key_template, name):
+        """Return the data cached for `name`, None if there is none.
+
+        With memcache_security_strategy, the key is derived from `name`
+        and the data is verified, and decrypted, before being returned.
         """
-        serialized_data = json.dumps(data)
         if self._memcache_security_strategy is None:
-            cache_key = CACHE_KEY_TEMPLATE % token
+            return self._cache.get(key_template % name)
+
+        keys = memcache_crypt.derive_keys(
+            name,
+            self._memcache_secret_key,
+            self._memcache_security_strategy)
+        cache_key = key_template % memcache_crypt.get_cache_key(keys)
+        raw_cached = self._cache.get(cache_key)
+        try:
+            # unprotect_data will return None if raw_cached is None
+            return memcache_crypt.unprotect_data(keys, raw_cached)
+        except Exception:
+            msg = 'Failed to decrypt/verify cache data'
+            self.LOG.exception(msg)
+            # this should have the same effect as data not
+            # found in cache
+            return None
+
+    def _cache_store_serialized(self, key_template, name, serialized_data,
+                                cache_time):
+        """Store data for `name`, the way _cache_get_serialized reads it."""
+        if self._memcache_security_strategy is None:
+            cache_key = key_template % name
             data_to_store = serialized_data
         else:
             keys = memcache_crypt.derive_keys(
-                token,
+                name,
                 self._memcache_secret_key,
                 self._memcache_security_strategy)
-            cache_key = CACHE_KEY_TEMPLATE % memcache_crypt.get_cache_key(keys)
+            cache_key = key_template % memcache_crypt.get_cache_key(keys)
             data_to_store = memcache_crypt.protect_data(keys, serialized_data)
 
+        self._cache_set(cache_key, data_to_store, cache_time)
+
+    def _cache_set(self, cache_key, data_to_store, cache_time):
         # Historically the swift cache conection used the argument
         # timeout= for the cache timeout, but this has been unified
         # with the official python memcache client with time= since
@@ -1004,11 +1295,11 @@ class AuthProtocol(object):
         try:
             self._cache.set(cache_key,
                             data_to_store,
-                            time=self.token_cache_time)
+                            time=cache_time)
         except(TypeError):
             self._cache.set(cache_key,
                             data_to_store,
-                            timeout=self.token_cache_time)
+                            timeout=cache_time)
 
     def _confirm_token_not_expired(self, data):
         if not data:
@@ -1025,7 +1316,27 @@ class AuthProtocol(object):
             raise InvalidUserToken('Token authorization failed')
         return expires
 
-    def _cache_put(self, token, data, expires):
+    def _token_cache_time(self, expires, signed=False):
+        """Return how long a validated token may stay in the cache.
+
+        The configured token_cache_time is never exceeded for tokens that
+        are about to expire. In adaptive mode PKI tokens validated against
+        a current revocation list are kept until they expire.
+
+        :param expires: token expiration as seconds since the epoch
+        :param signed: whether the token is a PKI token
+
+        """
+        if self.token_cache_time <= 0:
+            return self.token_cache_time
+
+        remaining = int(float(expires) - time.time())
+        if (signed and self.adaptive_token_cache_time and
+                self._token_revocation_list_is_current()):
+            return max(min(remaining, MAX_CACHE_TIME), 1)
+        return max(min(remaining, self.token_cache_time), 1)
+
+    def _cache_put(self, token, data, expires, signed=False):
         """Put token data into the cache.
 
         Stores the parsed expire date in cache allowing
@@ -1034,7 +1345,8 @@ class AuthProtocol(object):
         """
         if self._cache:
                 self.LOG.debug('Storing %s token in memcache', token)
-                self._cache_store(token, (data, expires))
+                self._cache_store(token, (data, expires),
+                                  self._token_cache_time(expires, signed))
 
     def _cache_store_invalid(self, token):
         """Store invalid token in cache."""
@@ -1097,14 +1409,22 @@ class AuthProtocol(object):
 
             raise InvalidUserToken()
 
-    def is_signed_token_revoked(self, signed_text):
-        """Indicate whether the token appears in the revocation list."""
+    def is_signed_token_revoked(self, signed_text, token_id=None):
+        """Indicate whether the token appears in the revocation list.
+
+        :param signed_text: the PKI token
+        :param token_id: the already computed digest of signed_text. Optional,
+                         calculated with hash_algorithm if not provided.
+
+        """
         revocation_list = self.token_revocation_list
         revoked_tokens = revocation_list.get('revoked', [])
         if not revoked_tokens:
             return
         revoked_ids = (x['id'] for x in revoked_tokens)
-        token_id = utils.hash_signed_token(signed_text)
+        if token_id is None:
+            token_id = utils.hash_signed_token(signed_text,
+                                               mode=self.hash_algorithm)
         for revoked_id in revoked_ids:
             if token_id == revoked_id:
                 self.LOG.debug('Token %s is marked as having been revoked',
@@ -1112,7 +1432,7 @@ class AuthProtocol(object):
                 return True
         return False
 
-    def cms_verify(self, data):
+    def cms_verify(self, data, inform='PEM'):
         """Verifies the signature of the provided data's IAW CMS syntax.
 
         If either of the certificate files are missing, fetch them and
@@ -1121,7 +1441,7 @@ class AuthProtocol(object):
         while True:
             try:
                 output = cms.cms_verify(data, self.signing_cert_file_name,
-                                        self.ca_file_name)
+                                        self.ca_file_name, inform=inform)
             except cms.subprocess.CalledProcessError as err:
                 if self.cert_file_missing(err.output,
                                           self.signing_cert_file_name):
@@ -1134,13 +1454,12 @@ class AuthProtocol(object):
                 raise err
             return output
 
-    def verify_signed_token(self, signed_text):
+    def verify_signed_token(self, signed_text, token_id=None):
         """Check that the token is unrevoked and has a valid signature."""
-        if self.is_signed_token_revoked(signed_text):
+        if self.is_signed_token_revoked(signed_text, token_id):
             raise InvalidUserToken('Token has been revoked')
 
-        formatted = cms.token_to_cms(signed_text)
-        return self.cms_verify(formatted)
+        return self.cms_verify(cms.token_to_der(signed_text), inform='DER')
 
     def verify_signing_dir(self):
         if os.path.exists(self.signing_dirname):
@@ -1176,13 +1495,14 @@ class AuthProtocol(object):
     def token_revocation_list_fetched_time(self, value):
         self._token_revocation_list_fetched_time = value
 
-    @property
-    def token_revocation_list(self):
+    def _token_revocation_list_is_current(self):
         timeout = (self.token_revocation_list_fetched_time +
                    self.token_revocation_list_cache_timeout)
-        list_is_current = timeutils.utcnow() < timeout
+        return timeutils.utcnow() < timeout
 
-        if list_is_current:
+    @property
+    def token_revocation_list(self):
+        if self._token_revocation_list_is_current():
             # Load the list from disk if required
             if not self._token_revocation_list:
                 with open(self.revoked_file_name, 'r') as f:
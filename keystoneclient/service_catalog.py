@@ -17,12 +17,57 @@
 # limitations under the License.
 
 
+import collections
+import threading
+import time
+
 from keystoneclient import exceptions
 
 
+# maximum number of tokens for which url lookups are shared, the least
+# recently used ones are dropped beyond
+SHARED_URLS_CACHE_SIZE = 256
+
+# seconds the url lookups of a token are shared for
+SHARED_URLS_CACHE_TTL = 300
+
+# memoized url lookups shared by every catalog built for the same token (e.g.
+# by clients constructed from the same auth_ref), keyed by the hash of the
+# token id, which is cached by the string, so that the tokens are not kept.
+# Each entry holds the time it expires at and the catalog data the lookups
+# were resolved from along with them, the lookups are only shared by the
+# catalogs of that very data object, which also rules out hash collisions.
+_shared_urls_caches = collections.OrderedDict()
+_shared_urls_caches_lock = threading.Lock()
+
+
+def _get_shared_urls_cache(token_id, data):
+    key = hash(token_id)
+    now = time.time()
+    with _shared_urls_caches_lock:
+        entry = _shared_urls_caches.pop(key, None)
+        if entry is None or entry[0] <= now or entry[1] is not data:
+            entry = (now + SHARED_URLS_CACHE_TTL, data, {})
+        # (re)inserted last, the first entry is the least recently used
+        _shared_urls_caches[key] = entry
+        while len(_shared_urls_caches) > SHARED_URLS_CACHE_SIZE:
+            _shared_urls_caches.popitem(last=False)
+    return entry[2]
+
+
+def _drop_shared_urls_cache(token_id):
+    with _shared_urls_caches_lock:
+        _shared_urls_caches.pop(hash(token_id), None)
+
+
 class ServiceCatalog(object):
     """Helper methods for dealing with a Keystone Service Catalog."""
 
+    # lazily built lookup structures, see _get_endpoints_index()
+    _endpoints_index = None
+    _urls_cache = None
+    _modified = False
+
     @classmethod
     def factory(cls, resource_dict, token=None, region_name=None):
         """Create ServiceCatalog object given a auth token."""
@@ -33,6 +78,123 @@ class ServiceCatalog(object):
         else:
             raise NotImplementedError('Unrecognized auth response')
 
+    def invalidate(self):
+        """Drop the endpoint lookup index.
+
+        The index is rebuilt from the catalog data on the next lookup. This
+        must be called whenever the underlying catalog data is modified;
+        AccessInfo does so whenever it is updated.
+        """
+        # the data no longer matches what was issued for the token, stop
+        # sharing lookups with other catalogs, including those built later
+        # from the same, possibly modified in place, data
+        if not self._modified:
+            token_id = self._get_token_id()
+            if token_id:
+                _drop_shared_urls_cache(token_id)
+        self._modified = True
+        self._endpoints_index = None
+        self._urls_cache = None
+
+    def _get_token_id(self):
+        """Return the id of the token the catalog belongs to, if known."""
+        raise NotImplementedError()
+
+    def _get_urls_cache(self):
+        """Return the dictionary holding memoized url lookups.
+
+        Lookups are shared with other catalogs of the same token and catalog
+        data, so that building a client from a cached token does not resolve
+        endpoints again.
+        """
+        if self._urls_cache is None:
+            token_id = None if self._modified else self._get_token_id()
+            if token_id:
+                self._urls_cache = _get_shared_urls_cache(token_id,
+                                                          self.get_data())
+            else:
+                self._urls_cache = {}
+        return self._urls_cache
+
+    def _get_endpoints_index(self):
+        """Return the endpoints of the catalog indexed by service type.
+
+        Each service type maps to a list holding the endpoint list of every
+        service of that type, in catalog order. The index is built on first
+        use so that catalogs which are never queried cost nothing.
+        """
+        if self._endpoints_index is None:
+            index = {}
+            for service in (self.get_data() or []):
+                index.setdefault(service['type'], []).append(
+                    service['endpoints'])
+            self._endpoints_index = index
+        return self._endpoints_index
+
+    def _normalize_endpoint_type(self, endpoint_type):
+        """Convert an endpoint type to the form used by the catalog."""
+        raise NotImplementedError()
+
+    def _endpoint_matches(self, endpoint, endpoint_type):
+        """Determine if the endpoint provides the given endpoint type."""
+        raise NotImplementedError()
+
+    def _endpoint_url(self, endpoint, endpoint_type):
+        """Return the url of the endpoint for the given endpoint type."""
+        raise NotImplementedError()
+
+    def _has_endpoints(self, service_type, endpoint_type):
+        cache = self._get_urls_cache()
+        key = (service_type, endpoint_type)
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+
+        services = self._get_endpoints_index().get(service_type)
+        found = bool(services) and any(
+            self._endpoint_matches(endpoint, endpoint_type)
+            for endpoint in services[-1])
+        cache[key] = found
+        return found
+
+    def _get_matching_urls(self, attr, filter_value, service_type,
+                           endpoint_type, last_service=False):
+        """Return the urls of all endpoints matching the given filters.
+
+        Results are memoized so that repeated lookups, e.g. one per request
+        made by a client, are a single dictionary access.
+
+        :param last_service: whether only the endpoints of the last service
+            of the type are considered, rather than those of all of them
+        :returns: tuple of urls, in catalog order
+        """
+        cache = self._get_urls_cache()
+        key = (service_type, endpoint_type, self.region_name,
+               attr, filter_value, last_service)
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+
+        services = self._get_endpoints_index().get(service_type, [])
+        if last_service:
+            services = services[-1:]
+        urls = []
+        for endpoints in services:
+            for endpoint in endpoints:
+                if not self._endpoint_matches(endpoint, endpoint_type):
+                    continue
+                if (self.region_name and
+                        endpoint.get('region') != self.region_name):
+                    continue
+                if not filter_value or endpoint.get(attr) == filter_value:
+                    urls.append(self._endpoint_url(endpoint, endpoint_type))
+
+        urls = tuple(urls)
+        cache[key] = urls
+        return urls
+
     def get_token(self):
         """Fetch token details from service catalog.
 
@@ -53,7 +215,22 @@ class ServiceCatalog(object):
         Returns endpoints for the specified service (or all) and
         that contain the specified type (or all).
         """
-        raise NotImplementedError()
+        if endpoint_type:
+            endpoint_type = self._normalize_endpoint_type(endpoint_type)
+
+        index = self._get_endpoints_index()
+        if service_type:
+            service_types = [service_type] if service_type in index else []
+        else:
+            service_types = index.keys()
+
+        sc = {}
+        for stype in service_types:
+            # the last service of a given type wins
+            sc[stype] = [endpoint for endpoint in index[stype][-1]
+                         if (not endpoint_type or
+                             self._endpoint_matches(endpoint, endpoint_type))]
+        return sc
 
     def get_urls(self, attr=None, filter_value=None,
                  service_type='identity', endpoint_type='publicURL'):
@@ -74,7 +251,12 @@ class ServiceCatalog(object):
 
         :returns: tuple of urls or None (if no match found)
         """
-        raise NotImplementedError()
+        endpoint_type = self._normalize_endpoint_type(endpoint_type)
+        if not self._has_endpoints(service_type, endpoint_type):
+            return None
+        return self._get_matching_urls(attr, filter_value,
+                                       service_type, endpoint_type,
+                                       last_service=True)
 
     def url_for(self, attr=None, filter_value=None,
                 service_type='identity', endpoint_type='publicURL'):
@@ -88,7 +270,17 @@ class ServiceCatalog(object):
                               `internal` or `internalURL`,
                               `admin` or 'adminURL`
         """
-        raise NotImplementedError()
+        if not self.get_data():
+            raise exceptions.EmptyCatalog('The service catalog is empty.')
+
+        endpoint_type = self._normalize_endpoint_type(endpoint_type)
+        urls = self._get_matching_urls(attr, filter_value,
+                                       service_type, endpoint_type)
+        if urls:
+            return urls[0]
+
+        raise exceptions.EndpointNotFound('%s endpoint for %s not found.' %
+                                          (endpoint_type, service_type))
 
     def get_data(self):
         """Get the raw catalog structure.
@@ -120,6 +312,9 @@ class ServiceCatalogV2(ServiceCatalog):
     def get_data(self):
         return self.catalog.get('serviceCatalog')
 
+    def _get_token_id(self):
+        return self.catalog.get('token', {}).get('id')
+
     def get_token(self):
         token = {'id': self.catalog['token']['id'],
                  'expires': self.catalog['token']['expires']}
@@ -131,64 +326,16 @@ class ServiceCatalogV2(ServiceCatalog):
             pass
         return token
 
-    def get_endpoints(self, service_type=None, endpoint_type=None):
-        if endpoint_type and 'URL' not in endpoint_type:
-            endpoint_type = endpoint_type + 'URL'
-
-        sc = {}
-        for service in (self.get_data() or []):
-            if service_type and service_type != service['type']:
-                continue
-            sc[service['type']] = []
-            for endpoint in service['endpoints']:
-                if endpoint_type and endpoint_type not in endpoint.keys():
-                    continue
-                sc[service['type']].append(endpoint)
-        return sc
-
-    def get_urls(self, attr=None, filter_value=None,
-                 service_type='identity', endpoint_type='publicURL'):
-        sc_endpoints = self.get_endpoints(service_type=service_type,
-                                          endpoint_type=endpoint_type)
-        endpoints = sc_endpoints.get(service_type)
-        if not endpoints:
-            return
-
+    def _normalize_endpoint_type(self, endpoint_type):
         if endpoint_type and 'URL' not in endpoint_type:
             endpoint_type = endpoint_type + 'URL'
+        return endpoint_type
 
-        return tuple(endpoint[endpoint_type]
-                     for endpoint in endpoints
-                     if (endpoint_type in endpoint
-                         and (not self.region_name
-                              or endpoint.get('region') == self.region_name)
-                         and (not filter_value
-                              or endpoint.get(attr) == filter_value)))
-
-    def url_for(self, attr=None, filter_value=None,
-                service_type='identity', endpoint_type='publicURL'):
-        catalog = self.get_data()
-
-        if not catalog:
-            raise exceptions.EmptyCatalog('The service catalog is empty.')
-
-        if 'URL' not in endpoint_type:
-            endpoint_type = endpoint_type + 'URL'
-
-        for service in catalog:
-            if service['type'] != service_type:
-                continue
-
-            endpoints = service['endpoints']
-            for endpoint in endpoints:
-                if (self.region_name and
-                        endpoint.get('region') != self.region_name):
-                    continue
-                if not filter_value or endpoint.get(attr) == filter_value:
-                    return endpoint[endpoint_type]
+    def _endpoint_matches(self, endpoint, endpoint_type):
+        return endpoint_type in endpoint
 
-        raise exceptions.EndpointNotFound('%s endpoint for %s not found.' %
-                                          (endpoint_type, service_type))
+    def _endpoint_url(self, endpoint, endpoint_type):
+        return endpoint[endpoint_type]
 
 
 class ServiceCatalogV3(ServiceCatalog):
@@ -211,6 +358,11 @@ class ServiceCatalogV3(ServiceCatalog):
     def get_data(self):
         return self.catalog.get('catalog')
 
+    def _get_token_id(self):
+        # AccessInfoV3 built from a stored auth_ref only carries the token id
+        # in its data
+        return self._auth_token or self.catalog.get('auth_token')
+
     def get_token(self):
         token = {'id': self._auth_token,
                  'expires': self.catalog['expires_at']}
@@ -227,63 +379,23 @@ class ServiceCatalogV3(ServiceCatalog):
             pass
         return token
 
-    def get_endpoints(self, service_type=None, endpoint_type=None):
+    def _normalize_endpoint_type(self, endpoint_type):
         if endpoint_type:
             endpoint_type = endpoint_type.rstrip('URL')
-        sc = {}
-        for service in (self.get_data() or []):
-            if service_type and service_type != service['type']:
-                continue
-            sc[service['type']] = []
-            for endpoint in service['endpoints']:
-                if endpoint_type and endpoint_type != endpoint['interface']:
-                    continue
-                sc[service['type']].append(endpoint)
-        return sc
+        return endpoint_type
+
+    def _endpoint_matches(self, endpoint, endpoint_type):
+        return endpoint.get('interface') == endpoint_type
+
+    def _endpoint_url(self, endpoint, endpoint_type):
+        return endpoint['url']
 
     def get_urls(self, attr=None, filter_value=None,
                  service_type='identity', endpoint_type='public'):
-        if endpoint_type:
-            endpoint_type = endpoint_type.rstrip('URL')
-        sc_endpoints = self.get_endpoints(service_type=service_type,
-                                          endpoint_type=endpoint_type)
-        endpoints = sc_endpoints.get(service_type)
-        if not endpoints:
-            return None
-
-        urls = list()
-        for endpoint in endpoints:
-            if (endpoint['interface'] == endpoint_type
-                    and (not self.region_name
-                         or endpoint.get('region') == self.region_name)
-                    and (not filter_value
-                         or endpoint.get(attr) == filter_value)):
-                urls.append(endpoint['url'])
-        return tuple(urls)
+        return super(ServiceCatalogV3, self).get_urls(
+            attr, filter_value, service_type, endpoint_type)
 
     def url_for(self, attr=None, filter_value=None,
                 service_type='identity', endpoint_type='public'):
-        catalog = self.get_data()
-
-        if not catalog:
-            raise exceptions.EmptyCatalog('The service catalog is empty.')
-
-        if endpoint_type:
-            endpoint_type = endpoint_type.rstrip('URL')
-
-        for service in catalog:
-            if service['type'] != service_type:
-                continue
-
-            endpoints = service['endpoints']
-            for endpoint in endpoints:
-                if endpoint.get('interface') != endpoint_type:
-                    continue
-                if (self.region_name and
-                        endpoint.get('region') != self.region_name):
-                    continue
-                if not filter_value or endpoint.get(attr) == filter_value:
-                    return endpoint['url']
-
-        raise exceptions.EndpointNotFound('%s endpoint for %s not found.' %
-                                          (endpoint_type, service_type))
+        return super(ServiceCatalogV3, self).url_for(
+            attr, filter_value, service_type, endpoint_type)
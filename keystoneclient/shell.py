@@ -215,6 +215,16 @@ class OpenStackIdentityShell(object):
         parser.add_argument('--os_cache',
                             help=argparse.SUPPRESS)
 
+        parser.add_argument('--os-cache-dir',
+                            metavar='<directory>',
+                            default=env('OS_CACHE_DIR'),
+                            help='Cache the auth token in files of this '
+                                 'directory rather than in the keyring, '
+                                 'which is much faster to read. Implies '
+                                 '--os-cache. Defaults to env[OS_CACHE_DIR]')
+        parser.add_argument('--os_cache_dir',
+                            help=argparse.SUPPRESS)
+
         parser.add_argument('--force-new-token',
                             default=False,
                             action="store_true",
@@ -422,6 +432,7 @@ class OpenStackIdentityShell(object):
                 insecure=args.insecure,
                 debug=args.debug,
                 use_keyring=args.os_cache,
+                token_cache_dir=args.os_cache_dir,
                 force_new_token=args.force_new_token,
                 stale_duration=args.stale_duration,
                 timeout=args.timeout)
@@ -0,0 +1,135 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Caches keeping the tokens obtained by HTTPClient between processes.
+
+The tokens are stored as JSON, keyed by `HTTPClient._build_keyring_key()`,
+either in the system keyring or in files of a private directory, which is
+much faster to read when a command line client starts.
+"""
+
+import errno
+import hashlib
+import os
+import stat
+import tempfile
+
+import six
+
+from keystoneclient import access
+from keystoneclient.openstack.common import jsonutils
+
+
+KEYRING_SERVICE = "keystoneclient_auth"
+
+# default directory of FileTokenCache
+CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join('~', '.cache'),
+    'keystoneclient', 'tokens')
+
+
+def serialize(auth_ref):
+    """Return `auth_ref` as compact JSON text."""
+    return jsonutils.dumps(auth_ref.copy(), separators=(',', ':'))
+
+
+def deserialize(data):
+    """Return the AccessInfo serialized as `data`.
+
+    :raises: ValueError if `data` is not a serialized token, e.g. a pickled
+        one stored by previous versions
+    """
+    try:
+        return access.AccessInfo.factory(**jsonutils.loads(data))
+    except (TypeError, NotImplementedError):
+        raise ValueError('Unrecognized token data')
+
+
+class KeyringTokenCache(object):
+    """Token cache storing the tokens in the system keyring.
+
+    :raises: ImportError if the keyring package is not installed
+    """
+
+    def __init__(self):
+        # imported only when used, it takes a while to load its backends
+        import keyring
+        self.keyring = keyring
+
+    def get(self, key):
+        return self.keyring.get_password(KEYRING_SERVICE, key)
+
+    def set(self, key, data):
+        self.keyring.set_password(KEYRING_SERVICE, key, data)
+
+
+class FileTokenCache(object):
+    """Token cache storing each token in a file of `directory`.
+
+    The directory and the files are only accessible to their owner, files
+    with broader permissions or owned by another user are ignored. Files
+    are replaced atomically, so that concurrent processes never read a
+    partially written token.
+
+    :param directory: created if needed, defaults to CACHE_DIR
+    """
+
+    def __init__(self, directory=None):
+        self.directory = os.path.expanduser(directory or CACHE_DIR)
+
+    def _path(self, key):
+        # the key holds user names and URLs, which may not be valid file
+        # names
+        if isinstance(key, six.text_type):
+            key = key.encode('utf-8')
+        return os.path.join(self.directory, hashlib.sha1(key).hexdigest())
+
+    def get(self, key):
+        try:
+            fd = os.open(self._path(key), os.O_RDONLY)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        try:
+            st = os.fstat(fd)
+            if (st.st_uid != os.getuid() or
+                    st.st_mode & (stat.S_IRWXG | stat.S_IRWXO)):
+                return None
+            chunks = []
+            while True:
+                chunk = os.read(fd, max(st.st_size, 4096))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            return b''.join(chunks).decode('utf-8')
+        finally:
+            os.close(fd)
+
+    def set(self, key, data):
+        try:
+            os.makedirs(self.directory, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        # mkstemp creates the file readable by its owner only
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data.encode('utf-8'))
+            os.rename(tmp_path, self._path(key))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
@@ -69,21 +69,33 @@ def print_dict(d, wrap=0):
     print(pt.get_string(sortby='Property'))
 
 
-def find_resource(manager, name_or_id):
-    """Helper for the _find_* methods."""
-    # first try to get entity as integer id
+def _is_uuid_like(value):
     try:
-        if isinstance(name_or_id, int) or name_or_id.isdigit():
-            return manager.get(int(name_or_id))
-    except exceptions.NotFound:
-        pass
+        uuid.UUID(value)
+        return True
+    except (TypeError, ValueError):
+        return False
 
-    # now try to get entity as uuid
-    try:
-        uuid.UUID(str(name_or_id))
-        return manager.get(name_or_id)
-    except (ValueError, exceptions.NotFound):
-        pass
+
+def find_resource(manager, name_or_id):
+    """Helper for the _find_* methods.
+
+    Only the lookups allowed by the shape of `name_or_id` are attempted, an
+    argument which is neither an integer nor a UUID is directly looked up by
+    name.
+    """
+    if isinstance(name_or_id, int) or name_or_id.isdigit():
+        # first try to get entity as integer id
+        try:
+            return manager.get(int(name_or_id))
+        except exceptions.NotFound:
+            pass
+    elif _is_uuid_like(name_or_id):
+        # now try to get entity as uuid
+        try:
+            return manager.get(name_or_id)
+        except exceptions.NotFound:
+            pass
 
     # finally try to find entity by name
     try:
@@ -96,7 +108,7 @@ def find_resource(manager, name_or_id):
         msg = ("Multiple %s matches found for '%s', use an ID to be more"
                " specific." % (manager.resource_class.__name__.lower(),
                                name_or_id))
-        raise exc.CommandError(msg)
+        raise exceptions.CommandError(msg)
 
 
 def unauthenticated(f):
@@ -128,8 +140,8 @@ def string_to_bool(arg):
     return arg.strip().lower() in ('t', 'true', 'yes', '1')
 
 
-def hash_signed_token(signed_text):
-    hash_ = hashlib.md5()
+def hash_signed_token(signed_text, mode='md5'):
+    hash_ = hashlib.new(mode)
     hash_.update(signed_text)
     return hash_.hexdigest()
 
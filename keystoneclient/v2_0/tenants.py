@@ -70,6 +70,7 @@ class Tenant(base.Resource):
 class TenantManager(base.ManagerWithFind):
     """Manager class for manipulating Keystone tenants."""
     resource_class = Tenant
+    filter_attributes = ('name',)
 
     def get(self, tenant_id):
         return self._get("/tenants/%s" % tenant_id, "tenant")
@@ -87,12 +88,15 @@ class TenantManager(base.ManagerWithFind):
 
         return self._create('/tenants', params, "tenant")
 
-    def list(self, limit=None, marker=None):
+    def list(self, limit=None, marker=None, stream=False):
         """Get a list of tenants.
 
         :param integer limit: maximum number to return. (optional)
         :param string marker: use when specifying a limit and making
                               multiple calls for querying. (optional)
+        :param boolean stream: return a generator yielding the tenants as
+                               the response is decoded instead of a list.
+                               (optional)
 
         :rtype: list of :class:`Tenant`
 
@@ -114,11 +118,44 @@ class TenantManager(base.ManagerWithFind):
             # for unscoped tokens
             reset = 1
             self.api.management_url = self.api.auth_url
-        tenant_list = self._list("/tenants%s" % query, "tenants")
+        tenant_list = self._list("/tenants%s" % query, "tenants",
+                                 stream=stream)
         if reset:
             del self.api.auth_plugin.opts["endpoint"]
         return tenant_list
 
+    def iter_all(self, page_size=None):
+        """Iterate over all tenants, requesting them page by page.
+
+        :param integer page_size: number of tenants requested at once.
+                                  (optional)
+
+        :rtype: iterator of :class:`Tenant`
+
+        """
+        if self.api.management_url is None:
+            # lists on the auth_url for unscoped tokens need the special
+            # casing done in list()
+            return self._iter_unscoped(page_size)
+        return self._list_pages("/tenants", "tenants", page_size=page_size)
+
+    def _iter_unscoped(self, page_size):
+        marker = None
+        while True:
+            tenants = self.list(limit=page_size, marker=marker)
+            for tenant in tenants:
+                yield tenant
+            if not page_size or len(tenants) < page_size:
+                return
+            marker = tenants[-1].id
+
+    def _list_filtered(self, name):
+        if self.api.management_url is None:
+            # the tenant list on the auth_url is not filtered
+            return None
+        return self._query_filtered("/tenants", {'name': name},
+                                    "tenant", "tenants")
+
     def update(self, tenant_id, tenant_name=None, description=None,
                enabled=None, **kwargs):
         """Update a tenant with a new name and description."""
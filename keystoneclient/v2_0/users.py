@@ -34,6 +34,7 @@ class User(base.Resource):
 class UserManager(base.ManagerWithFind):
     """Manager class for manipulating Keystone users."""
     resource_class = User
+    filter_attributes = ('name',)
 
     def get(self, user):
         return self._get("/users/%s" % base.getid(user), "user")
@@ -103,9 +104,13 @@ class UserManager(base.ManagerWithFind):
         """Delete a user."""
         return self._delete("/users/%s" % base.getid(user))
 
-    def list(self, tenant_id=None, limit=None, marker=None):
+    def list(self, tenant_id=None, limit=None, marker=None, stream=False):
         """Get a list of users (optionally limited to a tenant).
 
+        :param boolean stream: return a generator yielding the users as the
+                               response is decoded instead of a list.
+                               (optional)
+
         :rtype: list of :class:`User`
         """
 
@@ -120,10 +125,29 @@ class UserManager(base.ManagerWithFind):
             query = "?" + urllib.urlencode(params)
 
         if not tenant_id:
-            return self._list("/users%s" % query, "users")
+            return self._list("/users%s" % query, "users", stream=stream)
         else:
             return self._list("/tenants/%s/users%s" % (tenant_id, query),
-                              "users")
+                              "users", stream=stream)
+
+    def iter_all(self, tenant_id=None, page_size=None):
+        """Iterate over all users (optionally limited to a tenant),
+        requesting them page by page.
+
+        :param integer page_size: number of users requested at once.
+                                  (optional)
+
+        :rtype: iterator of :class:`User`
+        """
+        if not tenant_id:
+            url = "/users"
+        else:
+            url = "/tenants/%s/users" % tenant_id
+        return self._list_pages(url, "users", page_size=page_size)
+
+    def _list_filtered(self, name):
+        return self._query_filtered("/users", {'name': name},
+                                    "user", "users")
 
     def list_roles(self, user, tenant=None):
         return self.api.roles.roles_for_user(base.getid(user),
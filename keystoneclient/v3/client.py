@@ -63,6 +63,21 @@ class Client(httpclient.HTTPClient):
                             instantiation. (optional)
     :param integer timeout: Allows customization of the timeout for client
                             http requests. (optional)
+    :param integer pool_maxsize: Maximum number of connections kept per host,
+                                 the other connection pool options are
+                                 described in
+                                 :class:`keystoneclient.httpclient.HTTPClient`.
+                                 (optional)
+    :param boolean share_session: Makes the clients of the process for the
+                                  same endpoint share their connections.
+                                  default: False (optional)
+    :param string endpoint_selection: Spreads the requests across all the
+                                      matching endpoints of the service
+                                      catalog: 'round-robin' or
+                                      'least-latency'. (optional)
+    :param integer endpoint_cooldown: Seconds an endpoint is left out after
+                                      a connection error. default: 30
+                                      (optional)
 
     Example::
 
@@ -59,7 +59,7 @@ class ProjectManager(base.CrudManager):
             enabled=enabled,
             **kwargs)
 
-    def list(self, domain=None, user=None, **kwargs):
+    def list(self, domain=None, user=None, stream=False, **kwargs):
         """List projects.
 
         If domain or user are provided, then filter projects with
@@ -67,11 +67,15 @@ class ProjectManager(base.CrudManager):
 
         If ``**kwargs`` are provided, then filter projects with
         attributes matching ``**kwargs``.
+
+        If stream is True, a generator yielding the projects as the
+        response is decoded is returned instead of a list.
         """
         base_url = '/users/%s' % base.getid(user) if user else None
         return super(ProjectManager, self).list(
             base_url=base_url,
             domain_id=base.getid(domain),
+            stream=stream,
             **kwargs)
 
     def get(self, project):
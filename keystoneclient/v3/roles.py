@@ -97,6 +97,24 @@ class RoleManager(base.CrudManager):
 
         return super(RoleManager, self).list()
 
+    def list_for_projects(self, projects, user=None, group=None,
+                          max_workers=base.CONCURRENCY):
+        """Lists the role grants of a user or group on each of `projects`.
+
+        The grants of the projects are requested concurrently, at most
+        `max_workers` at once.
+
+        :returns: dict of the lists of roles, by project id
+        """
+        self._require_user_xor_group(user, group)
+
+        project_ids = [base.getid(project) for project in projects]
+        grants = base.map_concurrently(
+            lambda project_id: self.list(user=user, group=group,
+                                         project=project_id),
+            project_ids, max_workers=max_workers)
+        return dict(zip(project_ids, grants))
+
     def update(self, role, name=None):
         return super(RoleManager, self).update(
             role_id=base.getid(role),
@@ -115,6 +133,19 @@ class RoleManager(base.CrudManager):
             base_url=self._role_grants_base_url(user, group, domain, project),
             role_id=base.getid(role))
 
+    def grant_many(self, grants, max_workers=base.CONCURRENCY):
+        """Grants several roles, sending the requests concurrently.
+
+        :param grants: the keyword arguments of grant() for each grant
+        :param max_workers: maximum number of requests sent at once
+        :returns: list of the results of grant(), in the order of `grants`,
+                  holding the exception raised in place of the grants which
+                  failed
+        """
+        return base.map_concurrently(lambda kwargs: self.grant(**kwargs),
+                                     grants, max_workers=max_workers,
+                                     return_exceptions=True)
+
     def check(self, role, user=None, group=None, domain=None, project=None):
         """Checks if a user or group has a role on a domain or project."""
         self._require_domain_xor_project(domain, project)
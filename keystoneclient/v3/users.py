@@ -69,7 +69,7 @@ class UserManager(base.CrudManager):
             enabled=enabled)
 
     def list(self, project=None, domain=None, group=None, default_project=None,
-             **kwargs):
+             stream=False, **kwargs):
         """List users.
 
         If project, domain or group are provided, then filter
@@ -84,6 +84,9 @@ class UserManager(base.CrudManager):
 
         If both default_project and project is provided, the default_project
         will be used.
+
+        If stream is True, a generator yielding the users as the response is
+        decoded is returned instead of a list.
         """
         if project:
             LOG.warning("The project argument is deprecated, "
@@ -98,6 +101,7 @@ class UserManager(base.CrudManager):
             base_url=base_url,
             domain_id=base.getid(domain),
             default_project_id=default_project_id,
+            stream=stream,
             **kwargs)
 
     def get(self, user):
@@ -0,0 +1,69 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from keystoneclient.apiclient import balancing
+
+from tests import utils
+
+
+URLS = ("http://a:5000/v2.0", "http://b:5000/v2.0", "http://c:5000/v2.0")
+
+
+class EndpointSelectorTest(utils.TestCase):
+
+    def test_round_robin(self):
+        selector = balancing.EndpointSelector()
+        self.assertEqual([selector.select(URLS) for i in range(4)],
+                         list(URLS) + [URLS[0]])
+        self.assertEqual(selector.select(URLS[:1]), URLS[0])
+        self.assertIsNone(selector.select(()))
+
+    def test_ejection(self):
+        now = [100.0]
+        selector = balancing.EndpointSelector(cooldown=10)
+        with mock.patch("time.time", lambda: now[0]):
+            selector.report_failure(URLS[1])
+            self.assertTrue(selector.is_ejected(URLS[1]))
+            self.assertNotIn(URLS[1],
+                             [selector.select(URLS) for i in range(4)])
+
+            # tried again after the cooldown
+            now[0] += 10
+            self.assertFalse(selector.is_ejected(URLS[1]))
+            self.assertIn(URLS[1], [selector.select(URLS) for i in range(3)])
+
+    def test_all_ejected(self):
+        selector = balancing.EndpointSelector()
+        for url in URLS:
+            selector.report_failure(url)
+        self.assertIn(selector.select(URLS), URLS)
+
+    def test_least_latency(self):
+        selector = balancing.EndpointSelector(balancing.LEAST_LATENCY)
+        selector.report_success(URLS[0], 0.2)
+        selector.report_success(URLS[1], 0.1)
+        # not measured yet
+        self.assertEqual(selector.select(URLS), URLS[2])
+
+        selector.report_success(URLS[2], 0.3)
+        self.assertEqual(selector.select(URLS), URLS[1])
+        selector.report_success(URLS[1], 1.0)
+        self.assertEqual(selector.select(URLS), URLS[0])
+        selector.report_failure(URLS[0])
+        self.assertEqual(selector.select(URLS), URLS[2])
+
+    def test_unknown_strategy(self):
+        self.assertRaises(ValueError, balancing.EndpointSelector, "random")
@@ -15,6 +15,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
+
+import mock
+
 from keystoneclient.apiclient import base
 from keystoneclient.apiclient import client
 from keystoneclient.apiclient import exceptions
@@ -108,6 +112,9 @@ class FakeHTTPClient(fake_client.FakeHTTPClient):
     def delete_crud_resources_1(self, **kw):
         return (202, {}, None)
 
+    def delete_crud_resources_2(self, **kw):
+        raise exceptions.NotFound()
+
 
 class TestClient(client.BaseClient):
 
@@ -186,6 +193,221 @@ class BaseManagerTest(utils.TestCase):
         self.assertEqual(human_resource.id, "1")
         self.assertEqual(human_resource.name, name)
 
+    def test_list_stream(self):
+        human_resources = self.tc.human_resources._list(
+            "/human_resources", "human_resources", stream=True)
+        self.http_client.assert_called('GET', '/human_resources')
+        self.assertFalse(isinstance(human_resources, list))
+        self.assertEqual(list(human_resources),
+                         self.tc.human_resources.list())
+
+    def _paginated_client(self, fixtures):
+        self.http_client = FakeHTTPClient(fixtures=dict(
+            (url, {'GET': ({}, body)}) for url, body in fixtures.items()))
+        self.tc = TestClient(self.http_client)
+
+    def test_list_pages_marker(self):
+        self._paginated_client({
+            '/human_resources?limit=2': {'human_resources': [
+                {'id': 1}, {'id': 2}]},
+            '/human_resources?limit=2&marker=2': {'human_resources': [
+                {'id': 3}]},
+        })
+        for prefetch in (True, False):
+            pages = self.tc.human_resources._list_pages(
+                '/human_resources', 'human_resources', page_size=2,
+                prefetch=prefetch)
+            self.assertEqual([r.id for r in pages], [1, 2, 3])
+            self.http_client.assert_called(
+                'GET', '/human_resources?limit=2&marker=2')
+
+    def test_list_pages_marker_ignored(self):
+        page = {'human_resources': [{'id': 1}, {'id': 2}]}
+        self._paginated_client({
+            '/human_resources?limit=2': page,
+            '/human_resources?limit=2&marker=2': page,
+        })
+        pages = self.tc.human_resources._list_pages(
+            '/human_resources', 'human_resources', page_size=2)
+        self.assertEqual([r.id for r in pages], [1, 2])
+        self.http_client.assert_called(
+            'GET', '/human_resources?limit=2&marker=2')
+
+    def test_list_pages_next_link(self):
+        self._paginated_client({
+            '/human_resources': {
+                'human_resources': {
+                    'values': [{'id': 1}],
+                    'links': [{'rel': 'next',
+                               'href': 'http://host/v2.0/human_resources'
+                                       '?page=2'}]}},
+            '/human_resources?page=2': {
+                'human_resources': [{'id': 2}]},
+        })
+        self.tc.cached_endpoint = 'http://host/v2.0'
+        pages = self.tc.human_resources._list_pages(
+            '/human_resources', 'human_resources')
+        self.assertEqual([r.id for r in pages], [1, 2])
+
+    def test_iter_all(self):
+        self.assertEqual(list(self.tc.human_resources.iter_all()),
+                         self.tc.human_resources.list())
+
+
+class IterJSONCollectionTest(utils.TestCase):
+
+    def _chunks(self, document, size=1):
+        document = document.encode('utf-8')
+        return [document[i:i + size] for i in range(0, len(document), size)]
+
+    def test_collection(self):
+        document = (u'{"links": {"next": null}, "users": '
+                    u'[{"id": 1, "name": "\u00e9t\u00e9"}, '
+                    u'{"id": 22, "name": "\u00e9t\u00e9"}, 333, '
+                    u'[1, 2]], "count": 4}')
+        expected = [{"id": 1, "name": u"\u00e9t\u00e9"},
+                    {"id": 22, "name": u"\u00e9t\u00e9"}, 333, [1, 2]]
+        for size in (1, 2, 7, len(document)):
+            self.assertEqual(
+                list(base.iter_json_collection(self._chunks(document, size),
+                                               'users')),
+                expected)
+
+    def test_number_split_across_chunks(self):
+        self.assertEqual(
+            list(base.iter_json_collection(['{"ids": [12', '34]}'], 'ids')),
+            [1234])
+
+    def test_empty_collection(self):
+        self.assertEqual(
+            list(base.iter_json_collection(self._chunks('{"users": [ ]}'),
+                                           'users')),
+            [])
+
+    def test_values_collection(self):
+        document = '{"users": {"values": [{"id": 1}, {"id": 2}]}}'
+        self.assertEqual(
+            list(base.iter_json_collection(self._chunks(document), 'users')),
+            [{"id": 1}, {"id": 2}])
+
+    def test_missing_collection(self):
+        for document in ('{}', '{"projects": []}'):
+            self.assertRaises(
+                KeyError, list,
+                base.iter_json_collection(self._chunks(document), 'users'))
+
+    def test_truncated_document(self):
+        self.assertRaises(
+            ValueError, list,
+            base.iter_json_collection(self._chunks('{"users": [{"id": 1}'),
+                                      'users'))
+
+
+class EntityCacheTest(utils.TestCase):
+
+    def setUp(self):
+        super(EntityCacheTest, self).setUp()
+        self.now = 1000
+        # only the clock of the cache, time.time is already patched by the
+        # base class
+        self.clock_patcher = mock.patch.object(base, 'time')
+        clock = self.clock_patcher.start()
+        clock.time.side_effect = lambda: self.now
+        self.cache = base.EntityCache(ttl=10, max_size=2)
+
+    def tearDown(self):
+        self.clock_patcher.stop()
+        super(EntityCacheTest, self).tearDown()
+
+    def test_get_returns_copy(self):
+        info = {'id': '1', 'extra': {'a': 1}}
+        self.cache.set('/entities/1', info)
+        info['extra']['a'] = 2
+        cached = self.cache.get('/entities/1')
+        self.assertEqual(cached, {'id': '1', 'extra': {'a': 1}})
+        cached['extra']['a'] = 3
+        self.assertEqual(self.cache.get('/entities/1')['extra']['a'], 1)
+
+    def test_expiry(self):
+        self.cache.set('/entities/1', {'id': '1'})
+        self.now += 9
+        self.assertIsNotNone(self.cache.get('/entities/1'))
+        self.now += 1
+        self.assertIsNone(self.cache.get('/entities/1'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set('/entities/1', {'id': '1'})
+        self.cache.set('/entities/2', {'id': '2'})
+        self.cache.get('/entities/1')
+        self.cache.set('/entities/3', {'id': '3'})
+        self.assertIsNotNone(self.cache.get('/entities/1'))
+        self.assertIsNone(self.cache.get('/entities/2'))
+        self.assertIsNotNone(self.cache.get('/entities/3'))
+
+    def test_invalidate(self):
+        cache = base.EntityCache(ttl=10)
+        for url in ('/entities/1', '/entities/10', '/entities/1/things/2',
+                    '/others/1'):
+            cache.set(url, {'id': url})
+        cache.invalidate('/entities/1/things/2/')
+        self.assertIsNone(cache.get('/entities/1'))
+        self.assertIsNone(cache.get('/entities/1/things/2'))
+        self.assertIsNotNone(cache.get('/entities/10'))
+        self.assertIsNotNone(cache.get('/others/1'))
+        cache.invalidate('/entities?name=x')
+        self.assertIsNone(cache.get('/entities/10'))
+        self.assertIsNotNone(cache.get('/others/1'))
+
+
+class MapConcurrentlyTest(utils.TestCase):
+
+    def test_results_in_order(self):
+        self.assertEqual(base.map_concurrently(lambda i: i * 2, range(20),
+                                               max_workers=4),
+                         [i * 2 for i in range(20)])
+        self.assertEqual(base.map_concurrently(lambda i: i, []), [])
+
+    def test_runs_concurrently(self):
+        running = []
+        started = threading.Event()
+
+        def call(item):
+            running.append(item)
+            if len(running) == 3:
+                started.set()
+            started.wait(5)
+            return started.is_set()
+
+        self.assertEqual(base.map_concurrently(call, range(3), max_workers=3),
+                         [True] * 3)
+
+    def test_error(self):
+        calls = []
+
+        def call(item):
+            calls.append(item)
+            if item == 1:
+                raise exceptions.NotFound()
+            return item
+
+        self.assertRaises(exceptions.NotFound,
+                          base.map_concurrently, call, range(10),
+                          max_workers=1)
+        self.assertEqual(calls, [0, 1])
+
+    def test_return_exceptions(self):
+        def call(item):
+            if item % 2:
+                raise exceptions.NotFound()
+            return item
+
+        results = base.map_concurrently(call, range(4), max_workers=2,
+                                        return_exceptions=True)
+        self.assertEqual(results[0::2], [0, 2])
+        self.assertTrue(all(isinstance(result, exceptions.NotFound)
+                            for result in results[1::2]))
+
 
 class CrudManagerTest(utils.TestCase):
 
@@ -214,6 +436,15 @@ class CrudManagerTest(utils.TestCase):
             another_attr=None)
         self.assertEqual(len(crud_resources), 0)
 
+    def test_list_stream(self):
+        crud_resources = self.tc.crud_resources.list(
+            domain_id=self.domain_id, stream=True)
+        self.assertFalse(isinstance(crud_resources, list))
+        self.assertEqual([r.id for r in crud_resources],
+                         [self.crud_resource_id])
+        self.http_client.assert_called(
+            'GET', '/crud_resources?domain_id=%s' % self.domain_id)
+
     def test_get(self):
         crud_resource = self.tc.crud_resources.get(self.crud_resource_id)
         self.assertEqual(crud_resource.id, self.crud_resource_id)
@@ -238,3 +469,67 @@ class CrudManagerTest(utils.TestCase):
         ret = self.tc.crud_resources.head(
             crud_resource_id=self.crud_resource_id)
         self.assertTrue(ret)
+
+    def test_create_many(self):
+        crud_resources = self.tc.crud_resources.create_many(
+            [{'name': 'first'}, {'name': 'second'}], max_workers=2)
+        self.assertEqual([r.id for r in crud_resources],
+                         [self.crud_resource_id] * 2)
+        self.assertEqual(
+            sorted(call[3]['crud_resource']['name']
+                   for call in self.http_client.callstack),
+            ['first', 'second'])
+
+    def test_delete_many(self):
+        results = self.tc.crud_resources.delete_many(
+            [self.crud_resource_id, '2'])
+        self.assertEqual(results[0].status_code, 202)
+        self.assertTrue(isinstance(results[1], exceptions.NotFound))
+        self.assertEqual(
+            sorted((call[0], call[1]) for call in self.http_client.callstack),
+            [('DELETE', '/crud_resources/1'), ('DELETE', '/crud_resources/2')])
+
+    def test_delete_many_with_base_url(self):
+        url = '/domains/%s/crud_resources/1' % self.domain_id
+        self.http_client.fixtures = {url: {'DELETE': ({}, None)}}
+        results = self.tc.crud_resources.delete_many(
+            [self.crud_resource_id],
+            base_url='/domains/%s' % self.domain_id)
+        self.assertEqual(results[0].status_code, 200)
+        self.http_client.assert_called('DELETE', url)
+
+    def test_iter_all(self):
+        page1 = '/crud_resources?domain_id=%s' % self.domain_id
+        page2 = page1 + '&page=2'
+        self.http_client = FakeHTTPClient(fixtures={
+            page1: {'GET': ({}, {
+                'crud_resources': [{'id': '1'}, {'id': '2'}],
+                'links': {'next': 'http://host/v3' + page2}})},
+            page2: {'GET': ({}, {
+                'crud_resources': [{'id': '3'}],
+                'links': {'next': None}})},
+        })
+        self.tc = TestClient(self.http_client)
+        self.tc.cached_endpoint = 'http://host/v3'
+
+        crud_resources = self.tc.crud_resources.iter_all(
+            domain_id=self.domain_id)
+        self.assertEqual([r.id for r in crud_resources], ['1', '2', '3'])
+        self.http_client.assert_called('GET', page2)
+
+    def test_get_cached(self):
+        self.tc.entity_cache = base.EntityCache(ttl=60)
+        self.tc.crud_resources.get(self.crud_resource_id)
+        crud_resource = self.tc.crud_resources.get(self.crud_resource_id)
+        self.assertEqual(crud_resource.id, self.crud_resource_id)
+        self.assertTrue(crud_resource.is_loaded())
+        self.assertEqual(len(self.http_client.callstack), 1)
+
+    def test_write_invalidates_cached(self):
+        self.tc.entity_cache = base.EntityCache(ttl=60)
+        self.tc.crud_resources.get(self.crud_resource_id)
+        self.tc.crud_resources.delete(crud_resource_id=self.crud_resource_id)
+        self.tc.crud_resources.get(self.crud_resource_id)
+        self.assertEqual(
+            [call[0] for call in self.http_client.callstack],
+            ['GET', 'DELETE', 'GET'])
@@ -16,10 +16,13 @@
 #    under the License.
 
 
+import threading
+
 import mock
 import requests
 
 from keystoneclient.apiclient import auth
+from keystoneclient.apiclient import balancing
 from keystoneclient.apiclient import client
 from keystoneclient.apiclient import exceptions
 
@@ -42,6 +45,39 @@ class FakeAuthPlugin(auth.BaseAuthPlugin):
         return ("token-%s" % self.attempt, "/endpoint-%s" % self.attempt)
 
 
+class FakeAccessInfo(object):
+
+    def __init__(self, expiring):
+        self.expiring = expiring
+
+    def will_expire_soon(self, stale_duration=None):
+        return self.expiring
+
+
+class CountingAuthPlugin(auth.BaseAuthPlugin):
+    auth_system = "counting"
+    access_info = None
+    authentications = 0
+
+    def _do_authenticate(self, http_client):
+        self.authentications += 1
+        self.access_info = FakeAccessInfo(expiring=False)
+
+    def token_and_endpoint(self, endpoint_type, service_type):
+        return ("token-%s" % self.authentications, "/endpoint")
+
+
+class BalancedAuthPlugin(auth.BaseAuthPlugin):
+    auth_system = "balanced"
+    endpoints = ("/endpoint-a", "/endpoint-b")
+
+    def _do_authenticate(self, http_client):
+        pass
+
+    def token_and_endpoint(self, endpoint_type, service_type):
+        return ("token", self.endpoint_selector.select(self.endpoints))
+
+
 class ClientTest(utils.TestCase):
 
     def test_client_with_timeout(self):
@@ -60,6 +96,27 @@ class ClientTest(utils.TestCase):
                 verify=mock.ANY,
                 data=mock.ANY)
 
+    def test_client_with_json_codec(self):
+        codec = mock.Mock()
+        codec.dumps.return_value = "encoded"
+        http_client = client.HTTPClient(None, json_codec=codec)
+        mock_request = mock.Mock()
+        mock_request.return_value = requests.Response()
+        mock_request.return_value.status_code = 200
+        with mock.patch("requests.Session.request", mock_request):
+            http_client.request("POST", "/", json={"1": "2"})
+        codec.dumps.assert_called_once_with({"1": "2"})
+        self.assertEqual(mock_request.call_args[1]["data"], "encoded")
+
+    def test_debug_log_only_when_enabled(self):
+        http_client = client.HTTPClient(None)
+        http_client.debug = True
+        headers = mock.MagicMock()
+        with mock.patch.object(client._logger, "isEnabledFor",
+                               return_value=False):
+            http_client._http_log_req("GET", "/", {"headers": headers})
+        self.assertFalse(headers.__iter__.called)
+
     def test_concat_url(self):
         self.assertEqual(client.HTTPClient.concat_url("/a", "/b"), "/a/b")
         self.assertEqual(client.HTTPClient.concat_url("/a", "b"), "/a/b")
@@ -106,6 +163,183 @@ class ClientTest(utils.TestCase):
                 test_client, "GET", "/resource"),
             "GET /endpoint-1/resource")
 
+    def test_client_request_renews_expiring_token(self):
+        auth_plugin = CountingAuthPlugin()
+        auth_plugin.authenticate(None)
+        http_client = client.HTTPClient(auth_plugin)
+        test_client = TestClient(http_client)
+        http_client.request = lambda method, url, **kwargs: (
+            kwargs["headers"]["X-Auth-Token"])
+
+        self.assertEqual(
+            http_client.client_request(test_client, "GET", "/resource"),
+            "token-1")
+        auth_plugin.access_info.expiring = True
+        self.assertEqual(
+            http_client.client_request(test_client, "GET", "/resource"),
+            "token-2")
+        self.assertEqual(
+            http_client.client_request(test_client, "GET", "/resource"),
+            "token-2")
+
+    def test_client_request_renewal_failure(self):
+        auth_plugin = CountingAuthPlugin()
+        auth_plugin.authenticate(None)
+        auth_plugin.access_info.expiring = True
+        auth_plugin.opt_names = ["password"]
+        http_client = client.HTTPClient(auth_plugin)
+        http_client.request = lambda method, url, **kwargs: (
+            kwargs["headers"]["X-Auth-Token"])
+
+        self.assertEqual(
+            http_client.client_request(
+                TestClient(http_client), "GET", "/resource"),
+            "token-1")
+
+    def test_client_request_renewal_connection_error(self):
+        auth_plugin = CountingAuthPlugin()
+        auth_plugin.authenticate(None)
+        auth_plugin.access_info.expiring = True
+        auth_plugin._do_authenticate = mock.Mock(
+            side_effect=requests.ConnectionError("unreachable"))
+        http_client = client.HTTPClient(auth_plugin)
+        http_client.request = lambda method, url, **kwargs: (
+            kwargs["headers"]["X-Auth-Token"])
+
+        self.assertEqual(
+            http_client.client_request(
+                TestClient(http_client), "GET", "/resource"),
+            "token-1")
+        self.assertEqual(auth_plugin._do_authenticate.call_count, 1)
+
+    def test_client_request_renewal_backoff(self):
+        auth_plugin = CountingAuthPlugin()
+        auth_plugin.authenticate(None)
+        auth_plugin.access_info.expiring = True
+
+        def authenticate_expiring(http_client):
+            auth_plugin.authentications += 1
+            auth_plugin.access_info = FakeAccessInfo(expiring=True)
+
+        auth_plugin._do_authenticate = authenticate_expiring
+        http_client = client.HTTPClient(auth_plugin)
+        test_client = TestClient(http_client)
+        http_client.request = lambda method, url, **kwargs: (
+            kwargs["headers"]["X-Auth-Token"])
+
+        for _i in range(3):
+            self.assertEqual(
+                http_client.client_request(test_client, "GET", "/resource"),
+                "token-2")
+        with mock.patch("time.time",
+                        return_value=1234 + client.RENEWAL_RETRY_INTERVAL):
+            self.assertEqual(
+                http_client.client_request(test_client, "GET", "/resource"),
+                "token-3")
+
+    def test_client_request_reissue_single_flight(self):
+        threads_count = 5
+        auth_plugin = CountingAuthPlugin()
+        auth_plugin.authenticate(None)
+        http_client = client.HTTPClient(auth_plugin)
+        test_client = TestClient(http_client)
+        rejected = []
+        authenticating = threading.Event()
+        release = threading.Event()
+
+        def fake_request(method, url, **kwargs):
+            if kwargs["headers"]["X-Auth-Token"] == "token-1":
+                rejected.append(url)
+                raise exceptions.Unauthorized(method=method, url=url)
+            return kwargs["headers"]["X-Auth-Token"]
+
+        def fake_authenticate(http_client):
+            authenticating.set()
+            release.wait()
+            auth_plugin.authentications += 1
+
+        http_client.request = fake_request
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(http_client.client_request(
+                test_client, "GET", "/resource")))
+            for i in range(threads_count)]
+        with mock.patch.object(auth_plugin, "_do_authenticate",
+                               fake_authenticate):
+            for thread in threads:
+                thread.start()
+            authenticating.wait()
+            while len(rejected) < threads_count:
+                release.wait(0.01)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(auth_plugin.authentications, 2)
+        self.assertEqual(results, ["token-2"] * threads_count)
+
+    def test_client_request_endpoint_selection(self):
+        auth_plugin = BalancedAuthPlugin()
+        auth_plugin.endpoint_selector = balancing.EndpointSelector()
+        http_client = client.HTTPClient(auth_plugin)
+        test_client = TestClient(http_client)
+        urls = []
+
+        def fake_request(method, url, **kwargs):
+            urls.append(url)
+            if url.startswith("/endpoint-a"):
+                raise requests.ConnectionError()
+            resp = requests.Response()
+            resp.status_code = 200
+            return resp
+
+        with mock.patch.object(http_client.http, "request", fake_request):
+            self.assertRaises(requests.ConnectionError,
+                              http_client.client_request,
+                              test_client, "GET", "/resource")
+            for i in range(2):
+                http_client.client_request(test_client, "GET", "/resource")
+        self.assertEqual(urls, ["/endpoint-a/resource",
+                                "/endpoint-b/resource",
+                                "/endpoint-b/resource"])
+        self.assertTrue(
+            auth_plugin.endpoint_selector.is_ejected("/endpoint-a"))
+
+    def test_client_with_pool_options(self):
+        http_client = client.HTTPClient(None, pool_maxsize=50,
+                                        pool_block=True)
+        adapter = http_client.http.get_adapter("https://host/")
+        self.assertEqual(adapter._pool_maxsize, 50)
+        self.assertTrue(adapter._pool_block)
+        self.assertFalse(isinstance(client.HTTPClient(None).http,
+                                    client.PooledSession))
+
+    def test_get_shared_session(self):
+        session = client.get_shared_session("http://host:5000/v2.0",
+                                            pool_maxsize=50)
+        self.assertIs(client.get_shared_session("http://host:5000/v2.0",
+                                                pool_maxsize=50),
+                      session)
+        self.assertIsNot(client.get_shared_session("http://host:5000/v2.0"),
+                         session)
+        self.assertIsNot(client.get_shared_session("http://other:5000/v2.0",
+                                                   pool_maxsize=50),
+                         session)
+
+    def test_pooled_session_idle_timeout(self):
+        session = client.PooledSession(pool_idle_timeout=30)
+        now = [1000]
+        with mock.patch("time.time", lambda: now[0]):
+            with mock.patch("requests.Session.request"):
+                with mock.patch.object(session, "close") as close:
+                    session.request("GET", "http://host/")
+                    now[0] += 30
+                    session.request("GET", "http://host/")
+                    self.assertFalse(close.called)
+                    now[0] += 31
+                    session.request("GET", "http://host/")
+                    self.assertTrue(close.called)
+
 
 class FakeClient1(object):
     pass
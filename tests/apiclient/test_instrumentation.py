@@ -0,0 +1,203 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import mock
+import requests
+
+from keystoneclient.apiclient import client
+from keystoneclient.apiclient import exceptions
+from keystoneclient.apiclient import instrumentation
+
+from tests import utils
+
+
+def fake_response(status_code=200, content='{"a": 1}', elapsed=0.25):
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp._content = content
+    resp._content_consumed = True
+    resp.elapsed = datetime.timedelta(seconds=elapsed)
+    return resp
+
+
+class RecordingObserver(instrumentation.RequestObserver):
+
+    def __init__(self):
+        self.calls = []
+
+    def before_request(self, record):
+        self.calls.append(('before', record.method, record.status_code))
+
+    def after_request(self, record):
+        self.calls.append(('after', record.method, record.status_code))
+
+
+class UrlTemplateTest(utils.TestCase):
+
+    def test_url_template(self):
+        self.assertEqual(
+            instrumentation.url_template(
+                'http://host:5000/v3/users/8e8ec658c7b04243bdf86f7f2952c0d0'
+                '/groups/8e8ec658-c7b0-4243-bdf8-6f7f2952c0d0?name=x'),
+            'http://host:5000/v3/users/{id}/groups/{id}')
+        self.assertEqual(
+            instrumentation.url_template('http://host/v2.0/tenants/12'),
+            'http://host/v2.0/tenants/{id}')
+        self.assertEqual(
+            instrumentation.url_template('http://host/v2.0/tokens'),
+            'http://host/v2.0/tokens')
+        self.assertEqual(
+            instrumentation.url_template(
+                'http://host/v2.0/tokens/MIIBxgYJKoZIhvcNAQ-+/endpoints'),
+            'http://host/v2.0/tokens/{token}/endpoints')
+
+    def test_redact_url(self):
+        self.assertEqual(
+            instrumentation.redact_url(
+                'http://host/v2.0/tokens/MIIBxgYJKoZIhvcNAQ?belongsTo=12'),
+            'http://host/v2.0/tokens/{token}?belongsTo=12')
+        self.assertEqual(
+            instrumentation.redact_url('http://host/v2.0/tenants/12'),
+            'http://host/v2.0/tenants/12')
+
+
+class RequestRecordTest(utils.TestCase):
+
+    def test_finish(self):
+        now = [100.0]
+        with mock.patch('time.time', lambda: now[0]):
+            record = instrumentation.RequestRecord('POST', 'http://host/',
+                                                   '{"b": 2}')
+            now[0] += 1
+            record.finish(fake_response())
+        self.assertEqual(record.request_bytes, 8)
+        self.assertEqual(record.response_bytes, 8)
+        self.assertEqual(record.status_code, 200)
+        self.assertEqual(record.duration, 1)
+        self.assertEqual(record.ttfb, 0.25)
+        self.assertEqual(record.body_time, 0.75)
+        self.assertIsNone(record.error)
+
+
+class RequestStatsTest(utils.TestCase):
+
+    def test_aggregation(self):
+        stats = instrumentation.RequestStats(buckets=(0.1, 1))
+        for duration, status_code in ((0.05, 200), (0.5, 200), (5, 404)):
+            record = instrumentation.RequestRecord(
+                'GET', 'http://host/v3/users/%d' % status_code)
+            record.finish(fake_response(status_code))
+            record.duration = duration
+            stats.after_request(record)
+
+        self.assertEqual(stats.get_stats(), {
+            ('GET', 'http://host/v3/users/{id}'): {
+                'count': 3,
+                'errors': 1,
+                'duration': 5.55,
+                'response_bytes': 24,
+                'histogram': [1, 1, 1],
+            },
+        })
+        stats.reset()
+        self.assertEqual(stats.get_stats(), {})
+
+
+class TracingObserverTest(utils.TestCase):
+
+    def test_span(self):
+        tracer = mock.Mock()
+        observer = instrumentation.TracingObserver(tracer)
+        record = instrumentation.RequestRecord('GET', 'http://host/v3/users')
+        observer.before_request(record)
+        record.finish(error=requests.ConnectionError())
+        observer.after_request(record)
+
+        tracer.start_span.assert_called_once_with(
+            'HTTP GET', attributes={'http.method': 'GET',
+                                    'http.url': 'http://host/v3/users',
+                                    'http.route': 'http://host/v3/users'})
+        span = tracer.start_span.return_value
+        span.set_attribute.assert_called_once_with('error', True)
+        span.record_exception.assert_called_once_with(record.error)
+        span.end.assert_called_once_with()
+
+    def test_span_without_token(self):
+        tracer = mock.Mock()
+        observer = instrumentation.TracingObserver(tracer)
+        observer.before_request(instrumentation.RequestRecord(
+            'DELETE', 'http://host/v2.0/tokens/'
+            '8e8ec658c7b04243bdf86f7f2952c0d0'))
+
+        tracer.start_span.assert_called_once_with(
+            'HTTP DELETE',
+            attributes={'http.method': 'DELETE',
+                        'http.url': 'http://host/v2.0/tokens/{token}',
+                        'http.route': 'http://host/v2.0/tokens/{token}'})
+
+
+class HTTPClientInstrumentationTest(utils.TestCase):
+
+    def test_observers(self):
+        observer = RecordingObserver()
+        http_client = client.HTTPClient(None, observers=[observer])
+        with mock.patch('requests.Session.request',
+                        return_value=fake_response(404)):
+            self.assertRaises(exceptions.NotFound,
+                              http_client.request, 'GET', 'http://host/')
+        self.assertEqual(observer.calls,
+                         [('before', 'GET', None), ('after', 'GET', 404)])
+
+        http_client.remove_observer(observer)
+        with mock.patch('requests.Session.request',
+                        return_value=fake_response()):
+            http_client.request('GET', 'http://host/')
+        self.assertEqual(len(observer.calls), 2)
+
+    def test_observers_on_error(self):
+        observer = RecordingObserver()
+        http_client = client.HTTPClient(None)
+        http_client.add_observer(observer)
+        with mock.patch('requests.Session.request',
+                        side_effect=requests.ConnectionError()):
+            self.assertRaises(requests.ConnectionError,
+                              http_client.request, 'GET', 'http://host/')
+        self.assertEqual(observer.calls,
+                         [('before', 'GET', None), ('after', 'GET', None)])
+
+    def test_failing_observer(self):
+        failing = mock.Mock()
+        failing.before_request.side_effect = ValueError()
+        failing.after_request.side_effect = ValueError()
+        observer = RecordingObserver()
+        http_client = client.HTTPClient(None, observers=[failing, observer])
+        with mock.patch('requests.Session.request',
+                        return_value=fake_response()):
+            http_client.request('GET', 'http://host/')
+        self.assertEqual(observer.calls,
+                         [('before', 'GET', None), ('after', 'GET', 200)])
+
+    def test_timings_bounded(self):
+        http_client = client.HTTPClient(None, timings=True)
+        with mock.patch('requests.Session.request',
+                        return_value=fake_response()):
+            for i in range(instrumentation.TIMINGS_SIZE + 1):
+                http_client.request('GET', 'http://host/%d' % i)
+        timings = http_client.get_timings()
+        self.assertEqual(len(timings), instrumentation.TIMINGS_SIZE)
+        self.assertEqual(timings[0][0], 'GET http://host/1')
+        http_client.reset_timings()
+        self.assertEqual(http_client.get_timings(), [])
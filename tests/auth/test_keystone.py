@@ -4,6 +4,8 @@ import json
 import mock
 import requests
 
+from keystoneclient import access
+from keystoneclient.apiclient import balancing
 from keystoneclient.apiclient import client as api_client
 from keystoneclient.apiclient import exceptions
 from keystoneclient.apiclient import fake_client
@@ -74,6 +76,32 @@ class KeystoneAuthPluginV2Test(utils.TestCase):
             self.assertRaises(exceptions.AuthPluginOptionsMissing,
                               http_client.authenticate)
 
+    def test_token_and_endpoint_selection(self):
+        auth = keystone.KeystoneAuthPluginV2()
+        auth.access_info = access.AccessInfo.factory(body={"access": {
+            "token": {"id": "123"},
+            "serviceCatalog": [{
+                "type": "identity",
+                "endpoints": [{"adminURL": "http://a:35357/v2.0"},
+                              {"adminURL": "http://b:35357/v2.0"}],
+            }],
+        }})
+        self.assertEqual(
+            auth.token_and_endpoint("adminURL", "identity"),
+            ("123", "http://a:35357/v2.0"))
+        self.assertEqual(
+            auth.token_and_endpoint("adminURL", "identity"),
+            ("123", "http://a:35357/v2.0"))
+
+        auth.endpoint_selector = balancing.EndpointSelector()
+        self.assertEqual(
+            [auth.token_and_endpoint("adminURL", "identity")[1]
+             for i in range(3)],
+            ["http://a:35357/v2.0", "http://b:35357/v2.0",
+             "http://a:35357/v2.0"])
+        self.assertRaises(exceptions.EndpointNotFound,
+                          auth.token_and_endpoint, "publicURL", "identity")
+
 
 class KeystoneAuthPluginV3Test(utils.TestCase):
 
@@ -23,6 +23,7 @@ import string
 import sys
 import tempfile
 import testtools
+import time
 import uuid
 
 import fixtures
@@ -565,6 +566,62 @@ class RaisingHTTPNetworkError(FakeHTTPConnection):
         raise auth_token.NetworkError("Network connection error.")
 
 
+class StaticTokenBackend(auth_token.TokenValidationBackend):
+    """Token validation backend accepting a single well known token."""
+
+    token_data = {
+        'access': {
+            'token': {
+                'id': 'static-token',
+                'expires': '2999-01-01T00:00:10Z',
+            },
+            'user': {
+                'id': 'user_id1',
+                'name': 'user_name1',
+                'tenantId': 'tenant_id1',
+                'tenantName': 'tenant_name1',
+                'roles': [
+                    {'name': 'role1'},
+                    {'name': 'role2'},
+                ],
+            },
+            'serviceCatalog': {}
+        },
+    }
+
+    def handles(self, user_token):
+        return user_token == 'static-token'
+
+    def validate(self, user_token, token_id, retry=True):
+        return self.token_data
+
+
+class CatalogTokenBackend(StaticTokenBackend):
+    """Static token backend returning a token with a service catalog."""
+
+    token_data = {
+        'access': dict(StaticTokenBackend.token_data['access'],
+                       serviceCatalog=[{
+                           'type': 'compute',
+                           'endpoints': [{
+                               'region': 'RegionOne',
+                               'publicURL': 'http://compute1/public',
+                               'adminURL': 'http://compute1/admin',
+                           }, {
+                               'region': 'RegionTwo',
+                               'publicURL': 'http://compute2/public',
+                               'adminURL': 'http://compute2/admin',
+                           }],
+                       }, {
+                           'type': 'image',
+                           'endpoints': [{
+                               'region': 'RegionOne',
+                               'publicURL': 'http://image1/public',
+                           }],
+                       }]),
+    }
+
+
 class FakeApp(object):
     """This represents a WSGI app protected by the auth_token middleware."""
     def __init__(self, expected_env=None):
@@ -908,6 +965,114 @@ class AuthTokenMiddlewareTest(BaseAuthTokenMiddlewareTest):
             self.token_dict['revoked_token'])
         self.assertTrue(result)
 
+    def test_is_signed_token_revoked_uses_given_token_id(self):
+        self.middleware.token_revocation_list = self.get_revocation_list_json()
+        result = self.middleware.is_signed_token_revoked(
+            'not-the-token', self.token_dict['revoked_token_hash'])
+        self.assertTrue(result)
+
+    def test_revoked_token_with_hash_algorithm_receives_401(self):
+        conf = {'signing_dir': CERTDIR, 'hash_algorithm': 'sha256'}
+        self.set_middleware(conf=conf)
+        token = self.token_dict['revoked_token']
+        token_ids = [utils.hash_signed_token(token, mode='sha256')]
+        self.middleware.token_revocation_list = self.get_revocation_list_json(
+            token_ids)
+        req = webob.Request.blank('/')
+        req.headers['X-Auth-Token'] = token
+        self.middleware(req.environ, self.start_fake_response)
+        self.assertEqual(self.response_status, 401)
+
+    def test_invalid_hash_algorithm_raises_configuration_error(self):
+        conf = {'signing_dir': CERTDIR, 'hash_algorithm': 'no-such-hash'}
+        self.assertRaises(auth_token.ConfigurationError,
+                          self.set_middleware, conf=conf)
+
+    def test_custom_token_validation_backend(self):
+        conf = dict(self.conf, token_validation_backends=[StaticTokenBackend])
+        # StaticTokenBackend always returns a v2 token
+        self.set_middleware(fake_app=FakeApp, conf=conf)
+        self.middleware.http_client_class.last_requested_url = ''
+        req = webob.Request.blank('/')
+        req.headers['X-Auth-Token'] = 'static-token'
+        self.middleware(req.environ, self.start_fake_response)
+        self.assertEqual(self.response_status, 200)
+        self.assertEqual(req.environ['keystone.token_info'],
+                         StaticTokenBackend.token_data)
+        self.assertEqual(
+            '', self.middleware.http_client_class.last_requested_url)
+
+    def test_token_validation_backends_from_string(self):
+        conf = dict(self.conf, token_validation_backends=(
+            'tests.test_auth_token_middleware.StaticTokenBackend, pki'))
+        self.set_middleware(conf=conf)
+        backends = self.middleware.token_validation_backends
+        self.assertEqual(2, len(backends))
+        self.assertIsInstance(backends[0], StaticTokenBackend)
+        self.assertIsInstance(backends[1], auth_token.PKITokenBackend)
+
+    def test_token_not_handled_by_any_backend(self):
+        conf = dict(self.conf, token_validation_backends='pki')
+        self.set_middleware(conf=conf)
+        self.middleware.http_client_class.last_requested_url = ''
+        req = webob.Request.blank('/')
+        req.headers['X-Auth-Token'] = self.token_dict['uuid_token_default']
+        self.middleware(req.environ, self.start_fake_response)
+        self.assertEqual(self.response_status, 401)
+        self.assertEqual(
+            '', self.middleware.http_client_class.last_requested_url)
+
+    def test_unknown_token_validation_backend(self):
+        conf = dict(self.conf, token_validation_backends='no.such.Backend')
+        self.assertRaises(auth_token.ConfigurationError,
+                          self.set_middleware, conf=conf)
+
+    def test_service_catalog_projection(self):
+        conf = dict(self.conf,
+                    token_validation_backends=[CatalogTokenBackend],
+                    service_catalog_types='compute',
+                    service_catalog_interfaces='admin',
+                    service_catalog_regions='RegionTwo')
+        self.set_middleware(fake_app=FakeApp, conf=conf)
+        req = webob.Request.blank('/')
+        req.headers['X-Auth-Token'] = 'static-token'
+        self.middleware(req.environ, self.start_fake_response)
+        self.assertEqual(self.response_status, 200)
+
+        expected = [{'type': 'compute',
+                     'endpoints': [{'region': 'RegionTwo',
+                                    'adminURL': 'http://compute2/admin'}]}]
+        self.assertEqual(
+            jsonutils.loads(req.environ['HTTP_X_SERVICE_CATALOG']), expected)
+        self.assertEqual(
+            req.environ['keystone.token_info']['access']['serviceCatalog'],
+            expected)
+        # the backend's data is left untouched
+        self.assertEqual(
+            len(CatalogTokenBackend.token_data['access']['serviceCatalog']),
+            2)
+
+    def test_service_catalog_projection_v3(self):
+        self.set_middleware(conf=dict(self.conf,
+                                      service_catalog_types=['image'],
+                                      service_catalog_interfaces=['public']))
+        token_info = {'token': {'catalog': [
+            {'type': 'compute',
+             'endpoints': [{'interface': 'public', 'url': 'http://c'}]},
+            {'type': 'image',
+             'endpoints': [{'interface': 'public', 'url': 'http://i'},
+                           {'interface': 'admin', 'url': 'http://a'}]},
+        ]}}
+        projected = self.middleware._project_service_catalog(token_info)
+        self.assertEqual(projected['token']['catalog'], [
+            {'type': 'image',
+             'endpoints': [{'interface': 'public', 'url': 'http://i'}]}])
+
+    def test_service_catalog_not_projected_by_default(self):
+        token_info = CatalogTokenBackend.token_data
+        self.assertIs(self.middleware._project_service_catalog(token_info),
+                      token_info)
+
     def test_verify_signed_token_raises_exception_for_revoked_token(self):
         self.middleware.token_revocation_list = self.get_revocation_list_json()
         self.assertRaises(auth_token.InvalidUserToken,
@@ -1084,6 +1249,25 @@ class AuthTokenMiddlewareTest(BaseAuthTokenMiddlewareTest):
         self.assertRaises(auth_token.InvalidUserToken,
                           self._get_cached_token, token)
 
+    def test_memcache_set_invalid_signed(self):
+        req = webob.Request.blank('/')
+        token = self.token_dict['signed_token_scoped_expired']
+        req.headers['X-Auth-Token'] = token
+        self.middleware(req.environ, self.start_fake_response)
+        self.assertRaises(auth_token.InvalidUserToken,
+                          self._get_cached_token, token)
+
+    def test_memcache_with_hash_algorithm(self):
+        conf = {'signing_dir': CERTDIR, 'hash_algorithm': 'sha256'}
+        self.set_middleware(conf=conf)
+        req = webob.Request.blank('/')
+        token = self.token_dict['signed_token_scoped']
+        req.headers['X-Auth-Token'] = token
+        self.middleware(req.environ, self.start_fake_response)
+        token_id = cms.cms_hash_token(token, mode='sha256')
+        self.assertNotEqual(
+            self.middleware._cache_get(token_id, ignore_expires=True), None)
+
     def test_memcache_set_expired(self, extra_conf={}, extra_environ={}):
         token_cache_time = 10
         conf = {
@@ -1107,6 +1291,61 @@ class AuthTokenMiddlewareTest(BaseAuthTokenMiddlewareTest):
         finally:
             timeutils.clear_time_override()
 
+    def test_memcache_time_limited_by_token_expiry(self):
+        self.middleware._init_cache({})
+        token = 'my_token'
+        try:
+            now = datetime.datetime.utcnow()
+            timeutils.set_time_override(now)
+            expires = str(int(time.time()) + 5)
+            self.middleware._cache_put(token, 'this_data', expires)
+            self.assertEqual(
+                self.middleware._cache_get(token, ignore_expires=True),
+                'this_data')
+            timeutils.set_time_override(now + datetime.timedelta(seconds=6))
+            self.assertEqual(
+                self.middleware._cache_get(token, ignore_expires=True), None)
+        finally:
+            timeutils.clear_time_override()
+
+    def test_token_cache_time(self):
+        expires = time.time() + 3600
+        self.assertEqual(self.middleware._token_cache_time(expires, True),
+                         self.middleware.token_cache_time)
+        self.assertEqual(
+            self.middleware._token_cache_time(time.time() + 10.5), 10)
+
+    def test_adaptive_token_cache_time(self):
+        conf = dict(self.conf, adaptive_token_cache_time=True)
+        self.set_middleware(conf=conf)
+        self.middleware.token_revocation_list_cache_timeout = (
+            datetime.timedelta(hours=1))
+        expires = time.time() + 3600.5
+        self.assertEqual(self.middleware._token_cache_time(expires, True),
+                         3600)
+        # UUID tokens are not checked against the revocation list
+        self.assertEqual(self.middleware._token_cache_time(expires, False),
+                         self.middleware.token_cache_time)
+        # nor are PKI tokens while the revocation list is stale
+        self.middleware.token_revocation_list_fetched_time = (
+            datetime.datetime.min)
+        self.assertEqual(self.middleware._token_cache_time(expires, True),
+                         self.middleware.token_cache_time)
+
+    def test_adaptive_token_cache_time_rejects_revoked_cached_token(self):
+        conf = dict(self.conf, adaptive_token_cache_time=True)
+        self.set_middleware(conf=conf)
+        self.middleware.token_revocation_list_cache_timeout = (
+            datetime.timedelta(hours=1))
+        self.middleware._init_cache({})
+        token = self.token_dict['revoked_token']
+        self.middleware._validate_user_token(token)
+        self.assertNotEqual(self._get_cached_token(token), None)
+
+        self.middleware.token_revocation_list = self.get_revocation_list_json()
+        self.assertRaises(auth_token.InvalidUserToken,
+                          self.middleware._validate_user_token, token)
+
     def test_old_swift_memcache_set_expired(self):
         extra_conf = {'cache': 'swift.cache'}
         extra_environ = {'swift.cache': FakeSwiftOldMemcacheClient()}
@@ -1382,6 +1621,35 @@ class v2AuthTokenMiddlewareTest(BaseAuthTokenMiddlewareTest):
         }
         self.assertRaises(Exception, self.set_middleware, conf)
 
+    def test_supported_versions_cached(self):
+        cache = memorycache.Client()
+        self.middleware._cache = cache
+        versions = self.middleware._get_supported_versions()
+        self.assertIn('v2.0', versions)
+
+        # another worker of the service, sharing the cache, does not query
+        # the server
+        self.set_middleware(fake_http=RaisingHTTPConnection)
+        self.middleware._cache = cache
+        self.assertEqual(self.middleware._get_supported_versions(), versions)
+        self.assertEqual(self.middleware._choose_api_version(), 'v2.0')
+
+    def test_supported_versions_cached_protected(self):
+        conf = dict(self.conf, memcache_security_strategy='ENCRYPT',
+                    memcache_secret_key='mysecret')
+        self.set_middleware(conf=conf)
+        cache = memorycache.Client()
+        self.middleware._cache = cache
+        versions = self.middleware._get_supported_versions()
+
+        self.assertNotIn('keystone.example.com', ''.join(cache.cache))
+        for expiry, value in cache.cache.values():
+            self.assertNotIn('v2.0', value)
+
+        self.set_middleware(fake_http=RaisingHTTPConnection, conf=conf)
+        self.middleware._cache = cache
+        self.assertEqual(self.middleware._get_supported_versions(), versions)
+
 
 class v3AuthTokenMiddlewareTest(AuthTokenMiddlewareTest):
     """Test auth_token middleware with v3 tokens.
@@ -0,0 +1,82 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+
+import testtools
+
+from keystoneclient.common import cms
+
+
+ROOTDIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+CERTDIR = os.path.join(ROOTDIR, "examples/pki/certs")
+CMSDIR = os.path.join(ROOTDIR, "examples/pki/cms")
+SIGNING_CERT = os.path.join(CERTDIR, 'signing_cert.pem')
+CA = os.path.join(CERTDIR, 'cacert.pem')
+
+
+class CMSTest(testtools.TestCase):
+
+    def setUp(self):
+        super(CMSTest, self).setUp()
+        with open(os.path.join(CMSDIR, 'auth_token_scoped.pem')) as f:
+            self.pem = f.read()
+        with open(os.path.join(CMSDIR, 'auth_token_scoped.json')) as f:
+            self.token_data = json.load(f)
+        cms._ensure_subprocess()
+
+    def test_cms_to_token_strips_framing(self):
+        token = cms.cms_to_token(self.pem)
+        self.assertTrue(cms.is_ans1_token(token))
+        self.assertNotIn('\n', token)
+        self.assertNotIn('/', token)
+        self.assertNotIn(cms.PEM_CMS_BEGIN, token)
+        self.assertNotIn(cms.PEM_CMS_END, token)
+
+    def test_token_to_cms_round_trip(self):
+        token = cms.cms_to_token(self.pem)
+        self.assertEqual(self.pem, cms.token_to_cms(token))
+
+    def test_token_to_cms_line_length(self):
+        formatted = cms.token_to_cms('a' * (cms.PEM_LINE_LENGTH * 2 + 1))
+        self.assertEqual([cms.PEM_CMS_BEGIN,
+                          'a' * cms.PEM_LINE_LENGTH,
+                          'a' * cms.PEM_LINE_LENGTH,
+                          'a',
+                          cms.PEM_CMS_END,
+                          ''],
+                         formatted.split('\n'))
+
+    def test_token_to_cms_empty(self):
+        self.assertEqual('-----BEGIN CMS-----\n-----END CMS-----\n',
+                         cms.token_to_cms(''))
+
+    def test_verify_token(self):
+        token = cms.cms_to_token(self.pem)
+        output = cms.verify_token(token, SIGNING_CERT, CA)
+        self.assertEqual(self.token_data, json.loads(output))
+
+    def test_verify_token_matches_pem_verification(self):
+        token = cms.cms_to_token(self.pem)
+        self.assertEqual(cms.cms_verify(cms.token_to_cms(token),
+                                        SIGNING_CERT, CA),
+                         cms.verify_token(token, SIGNING_CERT, CA))
+
+    def test_verify_token_fails_for_tampered_token(self):
+        token = cms.cms_to_token(self.pem)
+        tampered = token[:100] + ('A' if token[100] != 'A' else 'B') + \
+            token[101:]
+        self.assertRaises(cms.subprocess.CalledProcessError,
+                          cms.verify_token, tampered, SIGNING_CERT, CA)
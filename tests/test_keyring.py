@@ -1,8 +1,13 @@
 import datetime
+import os
+import stat
+
+import fixtures
 
 from keystoneclient import access
 from keystoneclient import httpclient
 from keystoneclient.openstack.common import timeutils
+from keystoneclient import token_cache
 
 from tests import utils
 from tests.v2_0 import client_fixtures
@@ -128,3 +133,75 @@ class KeyringTest(utils.TestCase):
             token=TOKEN)
         self.assertEqual(auth_ref.auth_token, TOKEN)
         self.assertEqual(auth_ref.username, USERNAME)
+
+    def test_get_keyring_pickled(self):
+        cl = httpclient.HTTPClient(username=USERNAME, password=PASSWORD,
+                                   tenant_id=TENANT_ID, auth_url=AUTH_URL,
+                                   use_keyring=True)
+        keyring_key = cl._build_keyring_key(auth_url=AUTH_URL,
+                                            username=USERNAME)
+        # stored by previous versions, never unpickled
+        keyring.set_password(token_cache.KEYRING_SERVICE, keyring_key,
+                             pickle.dumps(access.AccessInfo.factory(
+                                 body=PROJECT_SCOPED_TOKEN)))
+        (keyring_key, auth_ref) = cl.get_auth_ref_from_keyring(
+            auth_url=AUTH_URL,
+            username=USERNAME)
+        self.assertIsNone(auth_ref)
+
+
+class FileTokenCacheTest(utils.TestCase):
+
+    def setUp(self):
+        super(FileTokenCacheTest, self).setUp()
+        self.cache_dir = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'tokens')
+        self.cl = httpclient.HTTPClient(username=USERNAME,
+                                        password=PASSWORD,
+                                        tenant_id=TENANT_ID,
+                                        auth_url=AUTH_URL,
+                                        token_cache_dir=self.cache_dir)
+        self.keyring_key = self.cl._build_keyring_key(auth_url=AUTH_URL,
+                                                      username=USERNAME)
+
+    def store_token(self):
+        self.cl.auth_ref = access.AccessInfo.factory(
+            body=PROJECT_SCOPED_TOKEN)
+        expires = timeutils.utcnow() + datetime.timedelta(minutes=30)
+        self.cl.auth_ref['token']['expires'] = timeutils.isotime(expires)
+        self.cl.store_auth_ref_into_keyring(self.keyring_key)
+
+    def test_set_and_get(self):
+        self.assertEqual(self.cl.get_auth_ref_from_keyring(
+            auth_url=AUTH_URL, username=USERNAME),
+            (self.keyring_key, None))
+
+        self.store_token()
+        (keyring_key, auth_ref) = self.cl.get_auth_ref_from_keyring(
+            auth_url=AUTH_URL, username=USERNAME)
+        self.assertEqual(auth_ref.auth_token, TOKEN)
+        self.assertEqual(auth_ref.username, USERNAME)
+        self.assertEqual(auth_ref.service_catalog.url_for(),
+                         self.cl.auth_ref.service_catalog.url_for())
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache_dir).st_mode),
+                         0o700)
+        files = os.listdir(self.cache_dir)
+        self.assertEqual(len(files), 1)
+        path = os.path.join(self.cache_dir, files[0])
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+
+    def test_get_group_readable(self):
+        self.store_token()
+        path = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        os.chmod(path, 0o640)
+        (keyring_key, auth_ref) = self.cl.get_auth_ref_from_keyring(
+            auth_url=AUTH_URL, username=USERNAME)
+        self.assertIsNone(auth_ref)
+
+    def test_set_replaces(self):
+        cache = token_cache.FileTokenCache(self.cache_dir)
+        cache.set(u'key', u'{"a":1}')
+        cache.set(u'key', u'{"b":2}')
+        self.assertEqual(cache.get(u'key'), u'{"b":2}')
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
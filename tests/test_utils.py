@@ -17,17 +17,25 @@ class FakeManager(object):
         '5678': {'name': '9876'}
     }
 
+    def __init__(self):
+        self.resources = dict(self.resources)
+        self.get_calls = 0
+
     def get(self, resource_id):
+        self.get_calls += 1
         try:
             return self.resources[str(resource_id)]
         except KeyError:
             raise exceptions.NotFound(resource_id)
 
     def find(self, name=None):
-        for resource_id, resource in self.resources.items():
-            if resource['name'] == str(name):
-                return resource
-        raise exceptions.NotFound(name)
+        matches = [resource for resource in self.resources.values()
+                   if resource['name'] == str(name)]
+        if not matches:
+            raise exceptions.NotFound(name)
+        if len(matches) > 1:
+            raise exceptions.NoUniqueMatch()
+        return matches[0]
 
 
 class FindResourceTestCase(test_utils.TestCase):
@@ -62,3 +70,21 @@ class FindResourceTestCase(test_utils.TestCase):
     def test_find_by_int_name(self):
         output = utils.find_resource(self.manager, 9876)
         self.assertEqual(output, self.manager.resources['5678'])
+
+    def test_find_by_str_name_skips_get(self):
+        utils.find_resource(self.manager, 'entity_one')
+        self.assertEqual(self.manager.get_calls, 0)
+
+    def test_find_by_uuid_name(self):
+        uuid = 'b4bbd2e5-8a8b-4d1e-bd45-1b1b9c7f1a13'
+        self.manager.resources['4321'] = {'name': uuid}
+        output = utils.find_resource(self.manager, uuid)
+        self.assertEqual(output, self.manager.resources['4321'])
+        self.assertEqual(self.manager.get_calls, 1)
+
+    def test_find_no_unique_match(self):
+        self.manager.resources['4321'] = {'name': 'entity_one'}
+        self.assertRaises(exceptions.CommandError,
+                          utils.find_resource,
+                          self.manager,
+                          'entity_one')
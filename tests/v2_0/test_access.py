@@ -1,4 +1,6 @@
+import copy
 import datetime
+import pickle
 
 from keystoneclient import access
 from keystoneclient.openstack.common import timeutils
@@ -72,3 +74,63 @@ class AccessInfoTest(utils.TestCase):
         self.assertTrue(auth_ref.scoped)
         self.assertTrue(auth_ref.project_scoped)
         self.assertFalse(auth_ref.domain_scoped)
+
+    def test_role_names(self):
+        auth_ref = access.AccessInfo.factory(body=PROJECT_SCOPED_TOKEN)
+        self.assertEquals(auth_ref.role_names, ['Member'])
+
+        auth_ref = access.AccessInfo.factory(body=UNSCOPED_TOKEN)
+        self.assertEquals(auth_ref.role_names, [])
+
+    def test_derived_values_follow_updates(self):
+        auth_ref = access.AccessInfo.factory(body=PROJECT_SCOPED_TOKEN)
+        self.assertFalse(hasattr(auth_ref, '__dict__'))
+        self.assertEquals(auth_ref.username, 'exampleuser')
+
+        auth_ref['user'] = {'id': 'u2', 'name': 'otheruser'}
+        self.assertEquals(auth_ref.username, 'otheruser')
+        self.assertEquals(auth_ref.user_id, 'u2')
+
+    def test_derived_values_follow_nested_updates(self):
+        body = copy.deepcopy(PROJECT_SCOPED_TOKEN)
+        expires = timeutils.utcnow() + datetime.timedelta(minutes=5)
+        body['access']['token']['expires'] = expires.isoformat()
+        auth_ref = access.AccessInfo.factory(body=body)
+        self.assertFalse(auth_ref.will_expire_soon())
+
+        expires = timeutils.utcnow() + datetime.timedelta(seconds=10)
+        auth_ref['token']['expires'] = expires.isoformat()
+        self.assertEquals(auth_ref.expires, timeutils.parse_isotime(
+                          auth_ref['token']['expires']))
+        self.assertTrue(auth_ref.will_expire_soon())
+
+        auth_ref['user']['name'] = 'otheruser'
+        auth_ref['token']['tenant']['id'] = 'otherproject'
+        self.assertEquals(auth_ref.username, 'otheruser')
+        self.assertEquals(auth_ref.project_id, 'otherproject')
+
+    def test_pickle(self):
+        auth_ref = access.AccessInfo.factory(body=PROJECT_SCOPED_TOKEN)
+        self.assertTrue(auth_ref.auth_url)
+
+        loaded = pickle.loads(pickle.dumps(auth_ref))
+        self.assertIsInstance(loaded, access.AccessInfoV2)
+        self.assertEquals(loaded, auth_ref)
+        self.assertEquals(loaded.expires, auth_ref.expires)
+        self.assertEquals(loaded.auth_url, auth_ref.auth_url)
+
+    def test_seconds_until_expiry(self):
+        now = timeutils.utcnow()
+        body = {'access': dict(UNSCOPED_TOKEN['access'])}
+        body['access']['token'] = dict(
+            body['access']['token'],
+            expires=(now + datetime.timedelta(minutes=5)).isoformat())
+        auth_ref = access.AccessInfo.factory(body=body)
+
+        timeutils.set_time_override(now)
+        self.addCleanup(timeutils.clear_time_override)
+        self.assertAlmostEqual(auth_ref.seconds_until_expiry(), 300)
+
+        timeutils.advance_time_seconds(400)
+        self.assertAlmostEqual(auth_ref.seconds_until_expiry(), -100)
+        self.assertTrue(auth_ref.will_expire_soon(stale_duration=0))
@@ -1,13 +1,22 @@
 import copy
 import json
 
+import mock
+import requests
+
+from keystoneclient.apiclient import exceptions
 from keystoneclient.generic import client
+from keystoneclient.openstack.common import memorycache
 from tests import utils
 
 
 class DiscoverKeystoneTests(utils.UnauthenticatedTestCase):
     def setUp(self):
         super(DiscoverKeystoneTests, self).setUp()
+        discovery_cache = mock.patch.object(client, '_discovery_cache',
+                                            memorycache.Client())
+        discovery_cache.start()
+        self.addCleanup(discovery_cache.stop)
         self.TEST_RESPONSE_DICT = {
             "versions": {
                 "values": [{
@@ -89,3 +98,94 @@ class DiscoverKeystoneTests(utils.UnauthenticatedTestCase):
             versions['v2.0']['url'],
             self.TEST_RESPONSE_DICT['versions']['values'][0]['links'][0]
             ['href'])
+
+    def test_get_versions_cached(self):
+        resp = utils.TestResponse({
+            "status_code": 200,
+            "text": json.dumps(self.TEST_RESPONSE_DICT),
+        })
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        self.add_request('GET',
+                         self.TEST_ROOT_URL,
+                         **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        versions = client.Client(
+            http_client=self.http_client).discover(self.TEST_ROOT_URL)
+        versions['v2.0']['url'] = None
+        # served from the cache shared with the first client, unaltered
+        cached = client.Client(
+            http_client=self.http_client).discover(self.TEST_ROOT_URL)
+        self.assertEqual(
+            cached['v2.0']['url'],
+            self.TEST_RESPONSE_DICT['versions']['values'][0]['links'][0]
+            ['href'])
+
+    def test_get_versions_not_cached(self):
+        resp = utils.TestResponse({
+            "status_code": 200,
+            "text": json.dumps(self.TEST_RESPONSE_DICT),
+        })
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        for i in range(2):
+            self.add_request('GET',
+                             self.TEST_ROOT_URL,
+                             **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        cs = client.Client(http_client=self.http_client,
+                           discovery_cache_ttl=0)
+        for i in range(2):
+            self.assertIn('v2.0', cs.discover(self.TEST_ROOT_URL))
+
+    def test_probe_endpoints(self):
+        clock = [0]
+
+        def answer_after(seconds):
+            def advance(*args, **kwargs):
+                clock[0] += seconds
+            return advance
+
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        kwargs['timeout'] = 2
+        for url, seconds in (('http://slow:5000/', 1.5),
+                             ('http://fast:5000/', 0.5)):
+            resp = utils.TestResponse({
+                "status_code": 300,
+                "text": json.dumps(self.TEST_RESPONSE_DICT),
+            })
+            self.add_request('GET', url, **kwargs).WithSideEffects(
+                answer_after(seconds)).AndReturn(resp)
+        self.add_request('GET', 'http://down:5000/', **kwargs).AndRaise(
+            requests.ConnectionError())
+        self.mox.ReplayAll()
+
+        cs = client.Client(http_client=self.http_client)
+        with mock.patch('time.time', lambda: clock[0]):
+            probes = cs.probe_endpoints(['http://slow:5000/',
+                                         'http://fast:5000/',
+                                         'http://down:5000/'],
+                                        timeout=2, max_workers=1)
+
+        self.assertEqual([(p['url'], p['healthy'], p['latency'])
+                          for p in probes],
+                         [('http://fast:5000/', True, 0.5),
+                          ('http://slow:5000/', True, 1.5),
+                          ('http://down:5000/', False, 0)])
+        self.assertIn('v2.0', probes[0]['versions'])
+        self.assertIsInstance(probes[2]['error'], requests.ConnectionError)
+
+    def test_select_endpoint_none_healthy(self):
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        kwargs['timeout'] = client.PROBE_TIMEOUT
+        self.add_request('GET', 'http://down:5000/', **kwargs).AndRaise(
+            requests.ConnectionError())
+        self.mox.ReplayAll()
+
+        cs = client.Client(http_client=self.http_client)
+        self.assertRaises(exceptions.EndpointNotFound,
+                          cs.select_endpoint, ['http://down:5000/'])
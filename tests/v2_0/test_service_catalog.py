@@ -1,5 +1,10 @@
+import copy
+
+import mock
+
 from keystoneclient import access
 from keystoneclient import exceptions
+from keystoneclient import service_catalog
 
 from tests import utils
 from tests.v2_0 import client_fixtures
@@ -8,7 +13,8 @@ from tests.v2_0 import client_fixtures
 class ServiceCatalogTest(utils.TestCase):
     def setUp(self):
         super(ServiceCatalogTest, self).setUp()
-        self.AUTH_RESPONSE_BODY = client_fixtures.AUTH_RESPONSE_BODY
+        self.AUTH_RESPONSE_BODY = copy.deepcopy(
+            client_fixtures.AUTH_RESPONSE_BODY)
 
     def test_building_a_service_catalog(self):
         auth_ref = access.AccessInfo.factory(None, self.AUTH_RESPONSE_BODY)
@@ -48,3 +54,130 @@ class ServiceCatalogTest(utils.TestCase):
 
         url = sc.url_for(service_type='image', endpoint_type='internalURL')
         self.assertEquals(url, "https://image-internal.south.host/v1/")
+
+    def test_service_catalog_get_urls(self):
+        auth_ref = access.AccessInfo.factory(None, self.AUTH_RESPONSE_BODY)
+        sc = auth_ref.service_catalog
+
+        self.assertEquals(sc.get_urls(service_type='compute'),
+                          ("https://compute.north.host/v1/1234",
+                           "https://compute.north.host/v1.1/3456"))
+        self.assertEquals(sc.get_urls('tenantId', '2',
+                                      service_type='compute'),
+                          ("https://compute.north.host/v1.1/3456",))
+        self.assertEquals(sc.get_urls(service_type='compute',
+                                      endpoint_type='adminURL'), None)
+        self.assertEquals(sc.get_urls(service_type='volume'), None)
+
+    def test_service_catalog_get_urls_several_services(self):
+        self.AUTH_RESPONSE_BODY['access']['serviceCatalog'].append({
+            'name': 'Other Servers',
+            'type': 'compute',
+            'endpoints': [{'adminURL': 'https://compute.south.host/v2'}],
+        })
+        auth_ref = access.AccessInfo.factory(None, self.AUTH_RESPONSE_BODY)
+        sc = auth_ref.service_catalog
+
+        # get_urls only considers the last service of the type, while
+        # url_for takes the first matching endpoint of any of them
+        self.assertEquals(sc.get_urls(service_type='compute'), None)
+        self.assertEquals(sc.get_urls(service_type='compute',
+                                      endpoint_type='adminURL'),
+                          ("https://compute.south.host/v2",))
+        self.assertEquals(sc.url_for(service_type='compute'),
+                          "https://compute.north.host/v1/1234")
+
+    def test_service_catalog_lookups_are_memoized(self):
+        auth_ref = access.AccessInfo.factory(None, self.AUTH_RESPONSE_BODY)
+        sc = auth_ref.service_catalog
+
+        urls = sc.get_urls(service_type='compute')
+        self.assertIs(urls, sc.get_urls(service_type='compute'))
+        self.assertEquals(sc.url_for(service_type='compute'), urls[0])
+
+    def test_service_catalog_index_invalidated_on_update(self):
+        auth_ref = access.AccessInfo.factory(None, self.AUTH_RESPONSE_BODY)
+        sc = auth_ref.service_catalog
+        self.assertEquals(sc.url_for(service_type='compute'),
+                          "https://compute.north.host/v1/1234")
+
+        catalog = copy.deepcopy(auth_ref['serviceCatalog'])
+        catalog[0]['endpoints'][0]['publicURL'] = "https://compute.new/v1"
+        auth_ref['serviceCatalog'] = catalog
+        self.assertEquals(sc.url_for(service_type='compute'),
+                          "https://compute.new/v1")
+
+        del auth_ref['serviceCatalog']
+        self.assertRaises(exceptions.EmptyCatalog, sc.url_for,
+                          service_type='compute')
+
+    def test_service_catalog_lookups_shared_by_token(self):
+        auth_ref = access.AccessInfo.factory(None, self.AUTH_RESPONSE_BODY)
+        urls = auth_ref.service_catalog.get_urls(service_type='compute')
+
+        # a client built from the same auth_ref reuses the resolved urls
+        other = access.AccessInfo.factory(**auth_ref)
+        self.assertIs(urls,
+                      other.service_catalog.get_urls(service_type='compute'))
+
+    def test_service_catalog_shared_lookups_not_recomputed(self):
+        auth_ref = access.AccessInfo.factory(None, self.AUTH_RESPONSE_BODY)
+        url = auth_ref.service_catalog.url_for(service_type='compute')
+
+        other = access.AccessInfo.factory(**auth_ref)
+        with mock.patch.object(service_catalog.ServiceCatalog,
+                               '_get_endpoints_index') as index:
+            with mock.patch('json.dumps') as dumps:
+                self.assertEquals(
+                    other.service_catalog.url_for(service_type='compute'),
+                    url)
+        self.assertFalse(index.called)
+        self.assertFalse(dumps.called)
+
+    def test_service_catalog_lookups_not_shared_after_update(self):
+        auth_ref = access.AccessInfo.factory(None, self.AUTH_RESPONSE_BODY)
+        other = access.AccessInfo.factory(**auth_ref)
+        self.assertEquals(
+            other.service_catalog.url_for(service_type='compute'),
+            "https://compute.north.host/v1/1234")
+
+        auth_ref['serviceCatalog'][0]['endpoints'][0]['publicURL'] = (
+            "https://compute.new/v1")
+        auth_ref['serviceCatalog'] = auth_ref['serviceCatalog']
+        self.assertEquals(
+            auth_ref.service_catalog.url_for(service_type='compute'),
+            "https://compute.new/v1")
+        self.assertEquals(
+            other.service_catalog.url_for(service_type='compute'),
+            "https://compute.north.host/v1/1234")
+
+        other = access.AccessInfo.factory(
+            None, copy.deepcopy(client_fixtures.AUTH_RESPONSE_BODY))
+        self.assertEquals(
+            other.service_catalog.url_for(service_type='compute'),
+            "https://compute.north.host/v1/1234")
+
+    def test_service_catalog_lookups_cache_bounds(self):
+        auth_ref = access.AccessInfo.factory(None, self.AUTH_RESPONSE_BODY)
+        urls = auth_ref.service_catalog.get_urls(service_type='compute')
+        self.assertNotIn(auth_ref.auth_token,
+                         repr(service_catalog._shared_urls_caches))
+
+        def get_urls():
+            other = access.AccessInfo.factory(**auth_ref)
+            return other.service_catalog.get_urls(service_type='compute')
+
+        # expired
+        with mock.patch('time.time',
+                        return_value=1234 +
+                        service_catalog.SHARED_URLS_CACHE_TTL):
+            self.assertIsNot(urls, get_urls())
+        urls = get_urls()
+
+        # least recently used
+        body = copy.deepcopy(self.AUTH_RESPONSE_BODY)
+        body['access']['token']['id'] = 'other'
+        other = access.AccessInfo.factory(None, body)
+        with mock.patch.object(service_catalog, 'SHARED_URLS_CACHE_SIZE', 1):
+            other.service_catalog.get_urls(service_type='compute')
+        self.assertIsNot(urls, get_urls())
@@ -180,6 +180,26 @@ class TenantTests(utils.TestCase):
         tenant_list = self.client.tenants.list()
         [self.assertTrue(isinstance(t, tenants.Tenant)) for t in tenant_list]
 
+    def test_list_stream(self):
+        resp = utils.TestResponse({
+            "status_code": 200,
+            "text": json.dumps(self.TEST_TENANTS),
+        })
+
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        kwargs['stream'] = True
+        self.add_request('GET',
+                         urlparse.urljoin(self.TEST_URL, 'v2.0/tenants'),
+                         **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        tenant_list = self.client.tenants.list(stream=True)
+        self.assertFalse(isinstance(tenant_list, list))
+        self.assertEqual(
+            [t.id for t in tenant_list],
+            [t['id'] for t in self.TEST_TENANTS['tenants']['values']])
+
     def test_list_limit(self):
         resp = utils.TestResponse({
             "status_code": 200,
@@ -231,6 +251,78 @@ class TenantTests(utils.TestCase):
         tenant_list = self.client.tenants.list(limit=1, marker=1)
         [self.assertTrue(isinstance(t, tenants.Tenant)) for t in tenant_list]
 
+    def test_iter_all(self):
+        tenants_list = self.TEST_TENANTS['tenants']['values']
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        for query, values in (('limit=3', tenants_list[:3]),
+                              ('limit=3&marker=1', tenants_list[3:])):
+            resp = utils.TestResponse({
+                "status_code": 200,
+                "text": json.dumps({"tenants": values}),
+            })
+            self.add_request('GET',
+                             urlparse.urljoin(self.TEST_URL,
+                                              'v2.0/tenants?' + query),
+                             **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        tenant_list = list(self.client.tenants.iter_all(page_size=3))
+        self.assertEqual([t.id for t in tenant_list], [3, 2, 1, 4])
+        [self.assertTrue(isinstance(t, tenants.Tenant)) for t in tenant_list]
+
+    def test_find_by_name(self):
+        resp = utils.TestResponse({
+            "status_code": 200,
+            "text": json.dumps({"tenant": self.TEST_TENANTS['tenants']
+                                ['values'][1]}),
+        })
+
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        self.add_request('GET',
+                         urlparse.urljoin(self.TEST_URL,
+                                          'v2.0/tenants?name=demo'),
+                         **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        tenant = self.client.tenants.find(name='demo')
+        self.assertTrue(isinstance(tenant, tenants.Tenant))
+        self.assertEqual(tenant.id, 2)
+
+    def test_findall_by_name_filters_unfiltered_response(self):
+        resp = utils.TestResponse({
+            "status_code": 200,
+            "text": json.dumps(self.TEST_TENANTS),
+        })
+
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        self.add_request('GET',
+                         urlparse.urljoin(self.TEST_URL,
+                                          'v2.0/tenants?name=admin'),
+                         **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        tenant_list = self.client.tenants.findall(name='admin')
+        self.assertEqual([t.id for t in tenant_list], [1])
+
+    def test_findall_by_other_attribute(self):
+        resp = utils.TestResponse({
+            "status_code": 200,
+            "text": json.dumps(self.TEST_TENANTS),
+        })
+
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        self.add_request('GET',
+                         urlparse.urljoin(self.TEST_URL, 'v2.0/tenants'),
+                         **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        tenant_list = self.client.tenants.findall(description='None')
+        self.assertEqual([t.id for t in tenant_list], [2, 1])
+
     def test_update(self):
         req_body = {
             "tenant": {
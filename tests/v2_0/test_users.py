@@ -135,6 +135,45 @@ class UserTests(utils.TestCase):
         user_list = self.client.users.list()
         [self.assertTrue(isinstance(u, users.User)) for u in user_list]
 
+    def test_list_stream(self):
+        resp = utils.TestResponse({
+            "status_code": 200,
+            "text": json.dumps(self.TEST_USERS),
+        })
+
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        kwargs['stream'] = True
+        self.add_request(
+            'GET',
+            urlparse.urljoin(self.TEST_URL, 'v2.0/users'),
+            **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        user_list = self.client.users.list(stream=True)
+        self.assertFalse(isinstance(user_list, list))
+        self.assertEqual([u.id for u in user_list],
+                         [u['id'] for u in self.TEST_USERS['users']['values']])
+
+    def test_find_by_name(self):
+        resp = utils.TestResponse({
+            "status_code": 200,
+            "text": json.dumps({"user": self.TEST_USERS['users']
+                                ['values'][1]}),
+        })
+
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.TEST_REQUEST_HEADERS
+        self.add_request(
+            'GET',
+            urlparse.urljoin(self.TEST_URL, 'v2.0/users?name=demo'),
+            **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        user = self.client.users.find(name='demo', enabled=True)
+        self.assertTrue(isinstance(user, users.User))
+        self.assertEqual(user.id, 2)
+
     def test_list_limit(self):
         resp = utils.TestResponse({
             "status_code": 200,
@@ -1,4 +1,5 @@
 import datetime
+import pickle
 
 from keystoneclient import access
 from keystoneclient.openstack.common import timeutils
@@ -104,3 +105,35 @@ class AccessInfoTest(utils.TestCase):
 
         self.assertFalse(auth_ref.domain_scoped)
         self.assertTrue(auth_ref.project_scoped)
+
+    def test_derived_values_follow_updates(self):
+        auth_ref = access.AccessInfo.factory(resp=TOKEN_RESPONSE,
+                                             body=PROJECT_SCOPED_TOKEN)
+        self.assertFalse(hasattr(auth_ref, '__dict__'))
+        self.assertEquals(auth_ref.role_names, [])
+
+        auth_ref.update(roles=[{'id': 'r1', 'name': 'admin'}])
+        self.assertEquals(auth_ref.role_names, ['admin'])
+
+    def test_pickle(self):
+        auth_ref = access.AccessInfo.factory(resp=TOKEN_RESPONSE,
+                                             body=PROJECT_SCOPED_TOKEN)
+
+        loaded = pickle.loads(pickle.dumps(auth_ref))
+        self.assertIsInstance(loaded, access.AccessInfoV3)
+        self.assertEquals(loaded, auth_ref)
+        self.assertEquals(loaded.auth_token, auth_ref.auth_token)
+        self.assertEquals(loaded.service_catalog.get_token()['id'],
+                          auth_ref.auth_token)
+        self.assertEquals(loaded.auth_url, auth_ref.auth_url)
+
+    def test_seconds_until_expiry(self):
+        body = {'token': dict(UNSCOPED_TOKEN['token'],
+                              expires_at='2013-05-01T12:00:00.500000+02:00')}
+        auth_ref = access.AccessInfo.factory(resp=TOKEN_RESPONSE, body=body)
+
+        timeutils.set_time_override(datetime.datetime(2013, 5, 1, 9, 59))
+        self.addCleanup(timeutils.clear_time_override)
+        self.assertAlmostEqual(auth_ref.seconds_until_expiry(), 60.5)
+        self.assertFalse(auth_ref.will_expire_soon(stale_duration=60))
+        self.assertTrue(auth_ref.will_expire_soon(stale_duration=61))
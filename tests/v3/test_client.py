@@ -121,3 +121,35 @@ class KeystoneClientTest(utils.TestCase):
             self.assertIsNone(new_client.password)
             self.assertEqual(new_client.management_url,
                              'http://admin:35357/v3')
+
+    def test_entity_cache(self):
+        with mock.patch.object(requests.Session,
+                               "request",
+                               self.project_scoped_mock_req):
+            c = client.Client(user_id='c4da488862bd435c9e6c0275a0d0e49a',
+                              password='password',
+                              project_id='225da22d3ce34b15877ea70b2a575f58',
+                              auth_url='http://somewhere/')
+            self.assertIsNone(c.entity_cache)
+            c = client.Client(user_id='c4da488862bd435c9e6c0275a0d0e49a',
+                              password='password',
+                              project_id='225da22d3ce34b15877ea70b2a575f58',
+                              auth_url='http://somewhere/',
+                              entity_cache_ttl=30)
+            self.assertEqual(c.entity_cache.ttl, 30)
+            self.assertEqual(c.entity_cache.max_size, 1000)
+
+    def test_share_session(self):
+        with mock.patch.object(requests.Session,
+                               "request",
+                               self.project_scoped_mock_req):
+            clients = [client.Client(
+                user_id='c4da488862bd435c9e6c0275a0d0e49a',
+                password='password',
+                project_id='225da22d3ce34b15877ea70b2a575f58',
+                auth_url='http://shared-session/',
+                pool_maxsize=25,
+                share_session=True) for i in range(2)]
+        self.assertIs(clients[0].http_client.http, clients[1].http_client.http)
+        adapter = clients[0].http_client.http.get_adapter('http://somewhere/')
+        self.assertEqual(adapter._pool_maxsize, 25)
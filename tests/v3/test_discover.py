@@ -1,13 +1,20 @@
 import copy
 import json
 
+import mock
+
 from keystoneclient.generic import client
+from keystoneclient.openstack.common import memorycache
 from tests import utils
 
 
 class DiscoverKeystoneTests(utils.UnauthenticatedTestCase):
     def setUp(self):
         super(DiscoverKeystoneTests, self).setUp()
+        discovery_cache = mock.patch.object(client, '_discovery_cache',
+                                            memorycache.Client())
+        discovery_cache.start()
+        self.addCleanup(discovery_cache.stop)
         self.TEST_RESPONSE_DICT = {
             "versions": {
                 "values": [{"id": "v3.0",
@@ -22,6 +22,32 @@ class ProjectTests(utils.TestCase, utils.CrudTests):
         kwargs.setdefault('name', uuid.uuid4().hex)
         return kwargs
 
+    def test_list_stream(self):
+        ref_list = [self.new_ref(), self.new_ref()]
+
+        domain_id = uuid.uuid4().hex
+        resp = utils.TestResponse({
+            "status_code": 200,
+            "text": self.serialize(ref_list),
+        })
+
+        method = 'GET'
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.headers[method]
+        kwargs['stream'] = True
+        self.add_request(
+            method,
+            urlparse.urljoin(
+                self.TEST_URL,
+                'v3/%s?domain_id=%s' % (self.collection_key, domain_id)),
+            **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        returned = self.manager.list(domain=domain_id, stream=True)
+        self.assertFalse(isinstance(returned, list))
+        self.assertEqual([r.id for r in returned],
+                         [ref['id'] for ref in ref_list])
+
     def test_list_projects_for_user(self):
         ref_list = [self.new_ref(), self.new_ref()]
 
@@ -246,6 +246,35 @@ class RoleTests(utils.TestCase, utils.CrudTests):
 
         self.manager.grant(role=ref['id'], project=project_id, user=user_id)
 
+    def test_project_role_grant_many(self):
+        user_id = uuid.uuid4().hex
+        project_id = uuid.uuid4().hex
+        ref = self.new_ref()
+        resp = utils.TestResponse({
+            "status_code": 201,
+            "text": '',
+        })
+
+        method = 'PUT'
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.headers[method]
+        self.add_request(
+            method,
+            urlparse.urljoin(
+                self.TEST_URL,
+                'v3/projects/%s/users/%s/%s/%s' % (
+                    project_id, user_id, self.collection_key, ref['id'])),
+            **kwargs).AndReturn((resp))
+        self.mox.ReplayAll()
+
+        results = self.manager.grant_many([
+            {'role': ref['id'], 'user': user_id},
+            {'role': ref['id'], 'project': project_id, 'user': user_id},
+        ])
+        self.assertEqual(len(results), 2)
+        self.assertTrue(isinstance(results[0], exceptions.ValidationError))
+        self.assertFalse(isinstance(results[1], Exception))
+
     def test_project_group_role_grant(self):
         group_id = uuid.uuid4().hex
         project_id = uuid.uuid4().hex
@@ -292,6 +321,35 @@ class RoleTests(utils.TestCase, utils.CrudTests):
 
         self.manager.list(project=project_id, user=user_id)
 
+    def test_project_role_list_for_projects(self):
+        user_id = uuid.uuid4().hex
+        project_ids = [uuid.uuid4().hex for i in range(3)]
+        ref_lists = {}
+
+        method = 'GET'
+        kwargs = copy.copy(self.TEST_REQUEST_BASE)
+        kwargs['headers'] = self.headers[method]
+        for project_id in project_ids:
+            ref_lists[project_id] = [self.new_ref()]
+            resp = utils.TestResponse({
+                "status_code": 200,
+                "text": self.serialize(ref_lists[project_id]),
+            })
+            self.add_request(
+                method,
+                urlparse.urljoin(
+                    self.TEST_URL,
+                    'v3/projects/%s/users/%s/%s' % (
+                        project_id, user_id, self.collection_key)),
+                **kwargs).InAnyOrder().AndReturn((resp))
+        self.mox.ReplayAll()
+
+        grants = self.manager.list_for_projects(project_ids, user=user_id)
+        self.assertEqual(sorted(grants), sorted(project_ids))
+        for project_id in project_ids:
+            self.assertEqual([r.id for r in grants[project_id]],
+                             [ref_lists[project_id][0]['id']])
+
     def test_project_group_role_list(self):
         group_id = uuid.uuid4().hex
         project_id = uuid.uuid4().hex
@@ -1,3 +1,5 @@
+import copy
+
 from keystoneclient import access
 from keystoneclient import exceptions
 
@@ -8,7 +10,8 @@ from tests.v3 import utils
 class ServiceCatalogTest(utils.TestCase):
     def setUp(self):
         super(ServiceCatalogTest, self).setUp()
-        self.AUTH_RESPONSE_BODY = client_fixtures.AUTH_RESPONSE_BODY
+        self.AUTH_RESPONSE_BODY = copy.deepcopy(
+            client_fixtures.AUTH_RESPONSE_BODY)
         self.RESPONSE = utils.TestResponse({
             "headers": client_fixtures.AUTH_RESPONSE_HEADERS
         })
@@ -53,3 +56,52 @@ class ServiceCatalogTest(utils.TestCase):
         sc = auth_ref.service_catalog
         url = sc.url_for(service_type='image', endpoint_type='internal')
         self.assertEquals(url, "http://glance.south.host/glanceapi/internal")
+
+    def test_service_catalog_get_urls(self):
+        auth_ref = access.AccessInfo.factory(self.RESPONSE,
+                                             self.AUTH_RESPONSE_BODY)
+        sc = auth_ref.service_catalog
+
+        self.assertEquals(sc.get_urls(service_type='image'),
+                          ("http://glance.north.host/glanceapi/public",
+                           "http://glance.south.host/glanceapi/public"))
+        self.assertEquals(sc.get_urls('region', 'South',
+                                      service_type='image',
+                                      endpoint_type='internal'),
+                          ("http://glance.south.host/glanceapi/internal",))
+        self.assertEquals(sc.get_urls(service_type='volume'), None)
+
+    def test_service_catalog_index_invalidated_on_update(self):
+        auth_ref = access.AccessInfo.factory(self.RESPONSE,
+                                             self.AUTH_RESPONSE_BODY)
+        sc = auth_ref.service_catalog
+        self.assertEquals(sc.url_for(service_type='compute'),
+                          "https://compute.north.host/novapi/public")
+
+        catalog = copy.deepcopy(auth_ref['catalog'])
+        catalog[0]['endpoints'][0]['url'] = "https://compute.new/novapi"
+        auth_ref.update(catalog=catalog)
+        self.assertEquals(sc.url_for(service_type='compute'),
+                          "https://compute.new/novapi")
+
+    def test_service_catalog_lookups_shared_by_token(self):
+        auth_ref = access.AccessInfo.factory(self.RESPONSE,
+                                             self.AUTH_RESPONSE_BODY)
+        urls = auth_ref.service_catalog.get_urls(service_type='compute')
+
+        # a client built from the same auth_ref reuses the resolved urls
+        other = access.AccessInfo.factory(**auth_ref)
+        self.assertIs(urls,
+                      other.service_catalog.get_urls(service_type='compute'))
+
+    def test_service_catalog_lookups_depend_on_catalog(self):
+        auth_ref = access.AccessInfo.factory(self.RESPONSE,
+                                             self.AUTH_RESPONSE_BODY)
+        self.assertEquals(
+            auth_ref.service_catalog.url_for(service_type='compute'),
+            "https://compute.north.host/novapi/public")
+
+        body = copy.deepcopy(self.AUTH_RESPONSE_BODY)
+        del body['token']['catalog']
+        unscoped = access.AccessInfo.factory(self.RESPONSE, body)
+        self.assertEquals(unscoped.auth_url, None)
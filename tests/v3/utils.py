@@ -153,7 +153,7 @@ class TestCase(testtools.TestCase):
                     "password"
                 ],
                 "auth_token": self.TEST_TOKEN,
-                "expires_at": "2020-01-01T00:00:10.000123Z",
+                "expires_at": "2999-01-01T00:00:10.000123Z",
                 "project": {
                     "domain": {
                         "id": self.TEST_DOMAIN_ID,
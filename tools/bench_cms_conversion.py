@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the conversions between PKI tokens and CMS documents.
+
+The token signed in examples/pki/cms is used by default. With --size, a
+random token carrying a document of that many bytes is used instead, e.g.
+to see how the conversions scale with the tokens of large catalogs.
+
+Usage: tools/bench_cms_conversion.py [--number N] [--size BYTES]
+"""
+
+import argparse
+import base64
+import os
+import sys
+import timeit
+
+ROOTDIR = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, ROOTDIR)
+
+from keystoneclient.common import cms  # noqa
+
+
+EXAMPLE_PEM = os.path.join(ROOTDIR, 'examples', 'pki', 'cms',
+                           'auth_token_scoped.pem')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=10000,
+                        help="number of conversions per run")
+    parser.add_argument("--size", type=int,
+                        help="bytes of the CMS document of a random token")
+    args = parser.parse_args()
+
+    if args.size:
+        token = base64.b64encode(os.urandom(args.size)).replace('/', '-')
+    else:
+        with open(EXAMPLE_PEM) as f:
+            token = cms.cms_to_token(f.read())
+    pem = cms.token_to_cms(token)
+
+    print("token of %d characters" % len(token))
+    for name, convert, arg in (("token_to_cms", cms.token_to_cms, token),
+                               ("token_to_der", cms.token_to_der, token),
+                               ("cms_to_token", cms.cms_to_token, pem)):
+        timer = timeit.Timer(lambda: convert(arg))
+        best = min(timer.repeat(repeat=3, number=args.number))
+        print("%-12s %.2f usec per conversion" %
+              (name, best * 1000000.0 / args.number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the overhead added by apiclient.client.HTTPClient.request.
+
+The HTTP session is replaced by one answering immediately, so that only the
+work done by the client itself (headers, JSON encoding, logging) is timed.
+
+Usage: tools/bench_http_request.py [--debug] [--number N] [--codec MODULE]
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from keystoneclient.apiclient import client  # noqa
+
+
+BODY = {
+    "user": {
+        "name": "bench",
+        "email": "bench@example.com",
+        "enabled": True,
+        "tenantId": "8e8ec658c7b04243bdf86f7f2952c0d0",
+        "extra": dict(("key%d" % i, "value%d" % i) for i in range(20)),
+    },
+}
+
+
+class FakeResponse(object):
+    status_code = 200
+    headers = {}
+    _content_consumed = False
+
+
+class FakeSession(object):
+
+    def request(self, method, url, **kwargs):
+        return FakeResponse()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000,
+                        help="number of requests per run")
+    parser.add_argument("--debug", action="store_true",
+                        help="create the client with debug=True, while its "
+                             "logger is not enabled for DEBUG")
+    parser.add_argument("--codec",
+                        help="module used as JSON codec, e.g. ujson")
+    args = parser.parse_args()
+
+    codec = importlib.import_module(args.codec) if args.codec else None
+    # keeps debug=True from logging to stderr
+    logging.getLogger(client.__name__).addHandler(logging.NullHandler())
+    http_client = client.HTTPClient(None, debug=args.debug, http=FakeSession(),
+                                    json_codec=codec)
+
+    for name, kwargs in (("GET", {}),
+                         ("POST", {"json": BODY})):
+        timer = timeit.Timer(
+            lambda: http_client.request(name, "http://localhost/v2.0/users",
+                                        **dict(kwargs)))
+        best = min(timer.repeat(repeat=3, number=args.number))
+        print("%-4s %.2f usec per request" %
+              (name, best * 1000000.0 / args.number))
+
+
+if __name__ == "__main__":
+    main()